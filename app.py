@@ -1,13 +1,25 @@
 import streamlit as st
-import requests
+import hashlib
 import json
 from datetime import datetime
-import socket
-import ssl
-import whois
-from whois import exceptions
 import re
 import random
+import os
+import tempfile
+import time
+import uuid
+from concurrent.futures import FIRST_COMPLETED, as_completed, wait
+import cache
+import providers
+from dns_lookup import start_queries, start_rdns, DKIM_SELECTORS, TYPE_A, TYPE_AAAA
+from ip_lookup import HEDGE_STATS
+from rdap import DomainNotFound, naive_utc, registrable_domain
+from smtp_probe import start_probes, mx_hosts
+from ssl_inspect import inspect_hosts
+from web_check import check_site, findings
+from whois_scheduler import get_scheduler
+from export import audit, export, available_formats, EXPORTERS, CHECKS
+from prefetch import start_diagnosis, wait_diagnosis, summarize, is_done, run, warm, WARM_STATS
 
 # Page Configuration
 st.set_page_config(
@@ -30,6 +42,9 @@ except:
 # Gemini models
 GEMINI_MODELS = ["gemini-2.5-flash", "gemini-2.5-flash-lite"]
 
+# Gemini analyses, shared between replicas so the same ticket is analysed once
+ANALYSIS_CACHE = cache.get_cache('analysis', maxsize=512, ttl=3600)
+
 # Custom CSS
 st.markdown("""
 <style>
@@ -93,6 +108,11 @@ def analyze_ticket_with_ai(ticket_text):
     if not GEMINI_API_KEY:
         return analyze_ticket_keywords(ticket_text)
     
+    cache_key = hashlib.sha256(ticket_text.encode()).hexdigest()
+    cached = ANALYSIS_CACHE.get(cache_key)
+    if cached is not None:
+        return cached
+    
     try:
         import google.generativeai as genai
         model = genai.GenerativeModel(random.choice(GEMINI_MODELS))
@@ -114,6 +134,7 @@ JSON format:
         text = response.text.strip().replace("```json", "").replace("```", "").strip()
         result = json.loads(text)
         result['kb_articles'] = search_kb_articles(ticket_text)
+        ANALYSIS_CACHE.set(cache_key, result)
         return result
     except:
         return analyze_ticket_keywords(ticket_text)
@@ -205,8 +226,8 @@ HostAfrica Support"""
     # Website
     elif any(w in ticket_lower for w in ['website', 'site', '404', '500', 'not loading']):
         result['issue_type'] = '🌐 Website Issue'
-        result['checks'] = ['Check A record', 'Verify nameservers', 'Check hosting']
-        result['actions'] = ['Use DNS tool', 'Check WHOIS']
+        result['checks'] = ['Check A record', 'Verify nameservers', 'Check hosting', 'Check site response times']
+        result['actions'] = ['Use DNS tool', 'Check WHOIS', 'Use Website tool (DNS/connect/TLS/server timing)']
         result['response_template'] = """Hi [Client],
 
 I've investigated your website issue.
@@ -263,6 +284,16 @@ HostAfrica Support"""
     
     return result
 
+def as_completed_growing(futures):
+    """Like as_completed, but also yields futures added to `futures` while iterating"""
+    seen = set()
+    while len(seen) < len(futures):
+        pending = [f for f in list(futures) if f not in seen]
+        done, _ = wait(pending, return_when=FIRST_COMPLETED)
+        for future in done:
+            seen.add(future)
+            yield future
+
 # SIDEBAR
 st.sidebar.title("🎫 Ticket Analyzer")
 
@@ -279,33 +310,52 @@ with st.sidebar.expander("🤖 AI Analysis", expanded=False):
     if st.button("🔍 Analyze Ticket", key="analyze_btn", use_container_width=True):
         if ticket_thread:
             with st.spinner("Analyzing ticket..."):
+                # Start checks for every domain/IP in the thread while the analysis runs
+                diagnosis = start_diagnosis(ticket_thread)
                 analysis = analyze_ticket_with_ai(ticket_thread)
-                
                 if analysis:
-                    st.success("✅ Analysis Complete")
-                    
-                    st.markdown("**Issue Type:**")
-                    st.info(analysis.get('issue_type', 'General'))
-                    
-                    kb = analysis.get('kb_articles', [])
-                    if kb:
-                        st.markdown("**📚 KB Articles:**")
-                        for a in kb:
-                            st.markdown(f"- [{a['title']}]({a['url']})")
-                    
-                    st.markdown("**Suggested Checks:**")
-                    for c in analysis.get('checks', []):
-                        st.markdown(f"- {c}")
-                    
-                    st.markdown("**Recommended Actions:**")
-                    for a in analysis.get('actions', []):
-                        st.markdown(f"- {a}")
-                    
-                    with st.expander("📝 Suggested Response Template"):
-                        resp = analysis.get('response_template', '')
-                        st.text_area("Copy this response:", value=resp, height=300, key="resp")
+                    # The analysis may be the cached dict other sessions get too
+                    analysis = dict(analysis, diagnosis=diagnosis)
+                    wait_diagnosis(diagnosis, timeout=3)
+                st.session_state.ticket_analysis = analysis
         else:
             st.warning("Please paste a ticket thread first")
+    
+    analysis = st.session_state.get('ticket_analysis')
+    if analysis:
+        st.success("✅ Analysis Complete")
+        
+        st.markdown("**Issue Type:**")
+        st.info(analysis.get('issue_type', 'General'))
+        
+        kb = analysis.get('kb_articles', [])
+        if kb:
+            st.markdown("**📚 KB Articles:**")
+            for a in kb:
+                st.markdown(f"- [{a['title']}]({a['url']})")
+        
+        st.markdown("**Suggested Checks:**")
+        for c in analysis.get('checks', []):
+            st.markdown(f"- {c}")
+        
+        diagnosis = analysis.get('diagnosis')
+        if diagnosis and diagnosis['checks']:
+            st.markdown("**⚡ Auto-Diagnosis:**")
+            st.caption("Already checked in the background - open the matching tool for full details")
+            for check, target, value in diagnosis['checks']:
+                level, text = summarize(check, value)
+                line = f"**{check.upper()}** `{target}`: {text}"
+                {'ok': st.success, 'warn': st.warning, 'error': st.error, 'pending': st.caption}[level](line)
+            if not all(is_done(value) for _, _, value in diagnosis['checks']):
+                st.button("🔄 Refresh Diagnosis", key="refresh_diagnosis", use_container_width=True)
+        
+        st.markdown("**Recommended Actions:**")
+        for a in analysis.get('actions', []):
+            st.markdown(f"- {a}")
+        
+        with st.expander("📝 Suggested Response Template"):
+            resp = analysis.get('response_template', '')
+            st.text_area("Copy this response:", value=resp, height=300, key="resp")
 
 st.sidebar.divider()
 
@@ -333,6 +383,27 @@ with st.sidebar.expander("📋 Support Checklist", expanded=True):
     Mail | Hosting | DNS | Billing | VPS
     """)
 
+st.sidebar.divider()
+
+with st.sidebar.expander("📶 Provider Health", expanded=False):
+    st.caption("Rate limiter and circuit breaker state of external lookup services")
+    for p in providers.snapshot():
+        icon = {"closed": "🟢", "half-open": "🟡", "open": "🔴"}[p['state']]
+        if p['state'] == "closed" and p['tokens'] < 1:
+            icon = "🟠"
+        st.markdown(f"{icon} **{p['provider']}** — {p['state']}")
+        latency = f"p50 {p['p50_ms']}ms / p90 {p['p90_ms']}ms" if p['p50_ms'] is not None else "no data yet"
+        st.caption(f"{latency} · errors {p['error_rate']} · tokens {p['tokens']} · "
+                   f"calls {p['calls']} · skipped {p['skipped']} · throttled {p['throttled']}"
+                   + (f" · retry in {p['retry_in_s']}s" if p['retry_in_s'] else ""))
+    st.caption(f"IP lookups: {HEDGE_STATS['lookups']} · hedged {HEDGE_STATS['hedged']} · "
+               f"won by hedge {HEDGE_STATS['hedge_wins']}")
+    for c in cache.snapshot():
+        st.caption(f"🗄️ {c['cache']} cache ({c['backend']}): {c['entries']} entries · "
+                   f"hit rate {c['hit_rate']}" + (f" · {c['errors']} errors" if c['errors'] else ""))
+    st.caption(f"Warm-ups: {WARM_STATS['started']} started · {WARM_STATS['used']} used · "
+               f"{WARM_STATS['cancelled']} cancelled · {WARM_STATS['skipped']} skipped under load")
+
 st.sidebar.divider()
 st.sidebar.caption("💡 HostAfrica Support Toolkit v2.0")
 
@@ -378,13 +449,26 @@ with col11:
     if st.button("🧹 Flush", use_container_width=True):
         st.session_state.tool = "Flush"
 with col12:
-    st.write("")
+    if st.button("📤 Export", use_container_width=True):
+        st.session_state.tool = "Export"
+
+col13, col14, col15, col16, col17, col18 = st.columns(6)
+with col13:
+    if st.button("🌍 Website", use_container_width=True):
+        st.session_state.tool = "Website"
+for col in (col14, col15, col16, col17, col18):
+    with col:
+        st.write("")
 
 st.divider()
 
 if 'tool' not in st.session_state:
     st.session_state.tool = "DNS"
 
+# Identifies this agent's background warm-ups across reruns
+if 'session_id' not in st.session_state:
+    st.session_state.session_id = uuid.uuid4().hex
+
 tool = st.session_state.tool
 
 # TOOLS IMPLEMENTATION
@@ -412,191 +496,359 @@ elif tool == "DNS":
     st.markdown("Check resolution, mail routing, authentication records, and nameservers")
     
     domain_dns = st.text_input("Enter domain name:", placeholder="example.com", key="dns_domain")
+    dkim_extra = st.text_input("Extra DKIM selectors (optional, comma separated):", placeholder="mykey, s2024", key="dkim_selectors")
+    probe_smtp = st.checkbox("Test mail servers (SMTP on ports 25/587/465)", value=True, key="dns_smtp_probe")
     
     if st.button("🔍 Analyze DNS Records", use_container_width=True):
         if domain_dns:
             domain_dns = domain_dns.strip().lower()
+            extra_selectors = [x.strip() for x in dkim_extra.split(',') if x.strip()]
             
-            with st.spinner(f"Performing comprehensive DNS analysis for {domain_dns}..."):
-                issues = []
-                warnings = []
-                success_checks = []
-                
-                # A Records
-                st.subheader("🌐 Web Resolution (A/AAAA Records)")
+            issues = []
+            warnings = []
+            success_checks = []
+            
+            # Lay out every section up front, then fill each one as its answer arrives
+            slots = {}
+            st.subheader("🌐 Web Resolution (A/AAAA Records)")
+            slots['A'] = st.empty()
+            slots['AAAA'] = st.empty()
+            st.subheader("📧 Mail Server Records (MX)")
+            slots['MX'] = st.empty()
+            smtp_slot = st.empty()
+            rdns_slot = st.empty()
+            st.subheader("🔗 Alias Records (CNAME)")
+            slots['CNAME'] = st.empty()
+            st.subheader("📝 Text Records (SPF/DKIM/DMARC)")
+            slots['TXT'] = st.empty()
+            slots['DMARC'] = st.empty()
+            slots['DKIM'] = st.empty()
+            st.subheader("🖥️ Nameservers (NS Records)")
+            slots['NS'] = st.empty()
+            st.subheader("🏛️ SOA Record (Zone Authority)")
+            slots['SOA'] = st.empty()
+            
+            st.divider()
+            summary_slot = st.empty()
+            
+            for key, slot in slots.items():
+                slot.caption(f"⏳ Waiting for {key} lookup...")
+            
+            # Reuse the checks prefetched from a ticket; custom selectors need a fresh run
+            if extra_selectors:
+                dns_futures = start_queries(domain_dns, extra_selectors + DKIM_SELECTORS)
+            else:
+                dns_futures = run('dns', domain_dns)
+            # WHOIS and SSL are usually next for the same domain
+            warm(domain_dns, exclude='dns', owner=st.session_state.session_id)
+            futures = {future: key for key, future in dns_futures.items()}
+            answers = {}
+            smtp_results = {}
+            rdns_results = {}
+            
+            # SMTP probes and reverse DNS checks join the loop as the answers they need arrive
+            for future in as_completed_growing(futures):
+                key = futures[future]
                 try:
-                    a_res = requests.get(f"https://dns.google/resolve?name={domain_dns}&type=A", timeout=5).json()
-                    if a_res.get('Answer'):
-                        st.success(f"✅ Found {len(a_res['Answer'])} A record(s)")
-                        for r in a_res['Answer']:
-                            st.code(f"A: {r['data']} (TTL: {r.get('TTL', 'N/A')}s)")
-                        success_checks.append("A record found")
-                    else:
-                        issues.append("Missing A record (Website won't load)")
-                        st.error("❌ No A records found")
+                    answers[key] = future.result()
+                    error = None
                 except Exception as e:
-                    st.error(f"❌ Error checking A records: {str(e)}")
+                    answers[key] = None
+                    error = e
+                
+                # Reverse DNS for every web and mail server address
+                if key in ('A', 'AAAA') and not error:
+                    ips = [r['data'] for r in answers[key].get('Answer') or [] if r.get('type') in (TYPE_A, TYPE_AAAA)]
+                    for target, check in start_rdns(ips=ips).items():
+                        futures[check] = ('rDNS', target)
+                elif key == 'MX' and not error:
+                    for target, check in start_rdns(hosts=mx_hosts(answers['MX'])).items():
+                        futures[check] = ('rDNS', target)
+                
+                # A Records
+                if key == 'A':
+                    with slots['A'].container():
+                        if error:
+                            st.error(f"❌ Error checking A records: {str(error)}")
+                        elif answers['A'].get('Answer'):
+                            st.success(f"✅ Found {len(answers['A']['Answer'])} A record(s)")
+                            for r in answers['A']['Answer']:
+                                st.code(f"A: {r['data']} (TTL: {r.get('TTL', 'N/A')}s)")
+                            success_checks.append("A record found")
+                        else:
+                            issues.append("Missing A record (Website won't load)")
+                            st.error("❌ No A records found")
                 
                 # AAAA Records (IPv6)
-                try:
-                    aaaa_res = requests.get(f"https://dns.google/resolve?name={domain_dns}&type=AAAA", timeout=5).json()
-                    if aaaa_res.get('Answer'):
-                        st.success(f"✅ Found {len(aaaa_res['Answer'])} AAAA record(s) (IPv6)")
-                        for r in aaaa_res['Answer']:
-                            st.code(f"AAAA: {r['data']}")
-                        success_checks.append("IPv6 configured")
-                    else:
-                        st.info("ℹ️ No IPv6 (AAAA) records configured")
-                except:
-                    pass
-
+                elif key == 'AAAA':
+                    with slots['AAAA'].container():
+                        if error:
+                            pass
+                        elif answers['AAAA'].get('Answer'):
+                            st.success(f"✅ Found {len(answers['AAAA']['Answer'])} AAAA record(s) (IPv6)")
+                            for r in answers['AAAA']['Answer']:
+                                st.code(f"AAAA: {r['data']}")
+                            success_checks.append("IPv6 configured")
+                        else:
+                            st.info("ℹ️ No IPv6 (AAAA) records configured")
+                
                 # MX Records
-                st.subheader("📧 Mail Server Records (MX)")
-                try:
-                    mx_res = requests.get(f"https://dns.google/resolve?name={domain_dns}&type=MX", timeout=5).json()
-                    if mx_res.get('Answer'):
-                        st.success(f"✅ Found {len(mx_res['Answer'])} mail server(s)")
-                        # Sort by priority
-                        mx_sorted = sorted(mx_res['Answer'], key=lambda x: int(x['data'].split()[0]))
-                        for r in mx_sorted:
-                            parts = r['data'].split()
-                            priority = parts[0]
-                            server = parts[1].rstrip('.')
-                            st.code(f"MX: Priority {priority} → {server}")
-                        success_checks.append("MX records configured")
-                    else:
-                        issues.append("No MX records (Cannot receive email)")
-                        st.error("❌ No MX records found. Client cannot receive emails.")
-                except Exception as e:
-                    st.error(f"❌ Error checking MX: {str(e)}")
-
+                elif key == 'MX':
+                    with slots['MX'].container():
+                        if error:
+                            st.error(f"❌ Error checking MX: {str(error)}")
+                        elif answers['MX'].get('Answer'):
+                            st.success(f"✅ Found {len(answers['MX']['Answer'])} mail server(s)")
+                            # Sort by priority
+                            mx_sorted = sorted(answers['MX']['Answer'], key=lambda x: int(x['data'].split()[0]))
+                            for r in mx_sorted:
+                                parts = r['data'].split()
+                                priority = parts[0]
+                                server = parts[1].rstrip('.')
+                                st.code(f"MX: Priority {priority} → {server}")
+                            success_checks.append("MX records configured")
+                            if probe_smtp:
+                                for probe_key, probe in start_probes(mx_hosts(answers['MX'])).items():
+                                    futures[probe] = ('SMTP',) + probe_key
+                                smtp_slot.caption("⏳ Connecting to mail servers...")
+                        else:
+                            issues.append("No MX records (Cannot receive email)")
+                            st.error("❌ No MX records found. Client cannot receive emails.")
+                
                 # CNAME Records
-                st.subheader("🔗 Alias Records (CNAME)")
-                try:
-                    cname_res = requests.get(f"https://dns.google/resolve?name=www.{domain_dns}&type=CNAME", timeout=5).json()
-                    if cname_res.get('Answer'):
-                        for r in cname_res['Answer']:
-                            st.code(f"www CNAME: {r['data'].rstrip('.')}")
-                        success_checks.append("www CNAME found")
-                    else:
-                        st.info("ℹ️ No CNAME found for 'www' (might be using an A record instead)")
-                except:
-                    pass
-
+                elif key == 'CNAME':
+                    with slots['CNAME'].container():
+                        if error:
+                            pass
+                        elif answers['CNAME'].get('Answer'):
+                            for r in answers['CNAME']['Answer']:
+                                st.code(f"www CNAME: {r['data'].rstrip('.')}")
+                            success_checks.append("www CNAME found")
+                        else:
+                            st.info("ℹ️ No CNAME found for 'www' (might be using an A record instead)")
+                
                 # TXT Records
-                st.subheader("📝 Text Records (SPF/DKIM/DMARC)")
-                try:
-                    txt_res = requests.get(f"https://dns.google/resolve?name={domain_dns}&type=TXT", timeout=5).json()
-                    if txt_res.get('Answer'):
-                        found_spf = False
-                        found_dmarc = False
-                        
-                        for r in txt_res['Answer']:
-                            val = r['data'].strip('"')
+                elif key == 'TXT':
+                    with slots['TXT'].container():
+                        if error:
+                            st.error(f"❌ Error checking TXT: {str(error)}")
+                        elif answers['TXT'].get('Answer'):
+                            found_spf = False
                             
-                            if val.startswith('v=spf1'):
-                                st.success("🛡️ **SPF Record Found (Email Authentication)**")
-                                st.code(f"SPF: {val}")
-                                found_spf = True
-                            elif val.startswith('v=DMARC'):
-                                st.success("🛡️ **DMARC Record Found (Email Policy)**")
-                                st.code(f"DMARC: {val}")
-                                found_dmarc = True
-                            elif 'dkim' in val.lower():
-                                st.success("🔑 **DKIM Record Found (Email Signature)**")
-                                st.code(f"DKIM: {val[:100]}...")
+                            for r in answers['TXT']['Answer']:
+                                val = r['data'].strip('"')
+                                
+                                if val.startswith('v=spf1'):
+                                    st.success("🛡️ **SPF Record Found (Email Authentication)**")
+                                    st.code(f"SPF: {val}")
+                                    found_spf = True
+                                elif val.startswith('v=DMARC'):
+                                    st.success("🛡️ **DMARC Record Found (Email Policy)**")
+                                    st.code(f"DMARC: {val}")
+                                elif 'dkim' in val.lower():
+                                    st.success("🔑 **DKIM Record Found (Email Signature)**")
+                                    st.code(f"DKIM: {val[:100]}...")
+                                else:
+                                    st.info("📋 **General TXT Record**")
+                                    st.code(f"TXT: {val[:100]}...")
+                            
+                            if found_spf:
+                                success_checks.append("SPF record found")
                             else:
-                                st.info("📋 **General TXT Record**")
-                                st.code(f"TXT: {val[:100]}...")
-                        
-                        if found_spf:
-                            success_checks.append("SPF record found")
+                                warnings.append("No SPF record (Email might go to spam)")
+                                st.warning("⚠️ No SPF record found")
                         else:
-                            warnings.append("No SPF record (Email might go to spam)")
-                            st.warning("⚠️ No SPF record found")
-                        
-                        if not found_dmarc:
-                            # Check _dmarc subdomain
-                            try:
-                                dmarc_res = requests.get(f"https://dns.google/resolve?name=_dmarc.{domain_dns}&type=TXT", timeout=5).json()
-                                if dmarc_res.get('Answer'):
-                                    st.success("🛡️ **DMARC Record Found (at _dmarc subdomain)**")
-                                    st.code(dmarc_res['Answer'][0]['data'].strip('"'))
-                                    found_dmarc = True
-                            except:
-                                pass
-                        
-                        if not found_dmarc:
-                            warnings.append("No DMARC record (Domain vulnerable to spoofing)")
-                            st.warning("⚠️ No DMARC record found")
-                    else:
-                        warnings.append("No TXT records found")
-                        st.warning("⚠️ No TXT records. Missing SPF/DMARC affects email deliverability.")
-                except Exception as e:
-                    st.error(f"❌ Error checking TXT: {str(e)}")
-
+                            warnings.append("No TXT records found")
+                            st.warning("⚠️ No TXT records. Missing SPF/DMARC affects email deliverability.")
+                
+                # DKIM lives at <selector>._domainkey.<domain>, so probe likely selectors
+                elif key == 'DKIM':
+                    with slots['DKIM'].container():
+                        st.markdown("**🔑 DKIM Selector Discovery**")
+                        dkim_found, dkim_dangling, dkim_failed = answers['DKIM'] or ([], [], [])
+                        if error:
+                            st.error(f"❌ Could not check DKIM: {str(error)}")
+                        elif dkim_found:
+                            for r in dkim_found:
+                                key_desc = f"{r['key_type'].upper()} {r['key_bits']}-bit" if r['key_bits'] else r['key_type'].upper()
+                                st.success(f"🔑 **DKIM key found** at `{r['name']}` ({key_desc})")
+                                st.code(f"DKIM: {r['record'][:100]}...")
+                                if r['cname']:
+                                    st.caption(f"Served via CNAME → {r['cname']}")
+                                for msg in r['warnings']:
+                                    st.warning(f"⚠️ {r['selector']}: {msg}")
+                                    warnings.append(f"DKIM {r['selector']}: {msg}")
+                            success_checks.append("DKIM key found")
+                        elif dkim_failed:
+                            st.error(f"❌ Could not check DKIM: {dkim_failed[0]['error']}")
+                        else:
+                            warnings.append("No DKIM key found for common selectors")
+                            st.warning(f"⚠️ No DKIM key found (checked {len(set(extra_selectors + DKIM_SELECTORS))} common selectors). "
+                                       "Ask the client or mail provider for the selector and add it above.")
+                        for r in dkim_dangling:
+                            st.error(f"❌ `{r['name']}` is a CNAME to `{r['cname']}`, which has no DKIM key")
+                            issues.append(f"DKIM selector '{r['selector']}' CNAME target has no key")
+                
                 # Nameservers
-                st.subheader("🖥️ Nameservers (NS Records)")
-                try:
-                    ns_res = requests.get(f"https://dns.google/resolve?name={domain_dns}&type=NS", timeout=5).json()
-                    if ns_res.get('Answer'):
-                        st.success(f"✅ Found {len(ns_res['Answer'])} nameserver(s)")
-                        for r in ns_res['Answer']:
-                            ns = r['data'].rstrip('.')
-                            st.code(f"NS: {ns}")
+                elif key == 'NS':
+                    with slots['NS'].container():
+                        if error:
+                            st.error(f"❌ Error checking NS: {str(error)}")
+                        elif answers['NS'].get('Answer'):
+                            st.success(f"✅ Found {len(answers['NS']['Answer'])} nameserver(s)")
+                            for r in answers['NS']['Answer']:
+                                ns = r['data'].rstrip('.')
+                                st.code(f"NS: {ns}")
+                                
+                                # Check if HostAfrica nameservers
+                                if 'host-ww.net' in ns:
+                                    if 'dan' in ns:
+                                        st.caption("✅ HostAfrica DirectAdmin nameserver")
+                                    else:
+                                        st.caption("✅ HostAfrica cPanel nameserver")
                             
-                            # Check if HostAfrica nameservers
-                            if 'host-ww.net' in ns:
-                                if 'dan' in ns:
-                                    st.caption("✅ HostAfrica DirectAdmin nameserver")
-                                else:
-                                    st.caption("✅ HostAfrica cPanel nameserver")
-                        
-                        success_checks.append("Nameservers configured")
-                    else:
-                        issues.append("No Nameservers found")
-                        st.error("❌ No nameservers found")
-                except Exception as e:
-                    st.error(f"❌ Error checking NS: {str(e)}")
-
+                            success_checks.append("Nameservers configured")
+                        else:
+                            issues.append("No Nameservers found")
+                            st.error("❌ No nameservers found")
+                
                 # SOA Record
-                st.subheader("🏛️ SOA Record (Zone Authority)")
-                try:
-                    soa_res = requests.get(f"https://dns.google/resolve?name={domain_dns}&type=SOA", timeout=5).json()
-                    if soa_res.get('Answer'):
-                        soa_data = soa_res['Answer'][0]['data']
-                        st.success("✅ SOA record found")
-                        st.code(f"SOA: {soa_data}")
-                        success_checks.append("SOA configured")
+                elif key == 'SOA':
+                    with slots['SOA'].container():
+                        if error:
+                            pass
+                        elif answers['SOA'].get('Answer'):
+                            soa_data = answers['SOA']['Answer'][0]['data']
+                            st.success("✅ SOA record found")
+                            st.code(f"SOA: {soa_data}")
+                            success_checks.append("SOA configured")
+                        else:
+                            warnings.append("No SOA record")
+                            st.warning("⚠️ No SOA record found")
+                
+                # SMTP probe of one MX host and port
+                elif isinstance(key, tuple) and key[0] == 'SMTP':
+                    smtp_results[key[1:]] = answers[key]
+                    smtp_pending = sum(1 for k in futures.values() if k[0] == 'SMTP') - len(smtp_results)
+                    with smtp_slot.container():
+                        st.markdown("**📬 Mail Server Connectivity**")
+                        if smtp_pending:
+                            st.caption(f"⏳ {smtp_pending} probe(s) still running...")
+                        rows = []
+                        for (mx_host, port), res in sorted(smtp_results.items()):
+                            tls = res['tls'] or {}
+                            rows.append({
+                                'MX Host': mx_host,
+                                'Port': port,
+                                'Result': f"✅ {res['code']}" if not res['error'] else f"❌ {res['error_type']}",
+                                'Banner': (res['banner'] or res['error'] or '')[:60],
+                                'STARTTLS': '-' if res['mode'] == 'tls' else {True: '✅', False: '❌', None: '?'}[res['starttls']],
+                                'TLS': tls.get('protocol'),
+                                'Cert': None if not tls else (
+                                    f"{'✅' if tls['verified'] else '⚠️ untrusted'} {tls['days_left']}d left"),
+                                'TCP ms': res['timings'].get('tcp_ms'),
+                                'Banner ms': res['timings'].get('banner_ms'),
+                                'TLS ms': res['timings'].get('tls_ms'),
+                            })
+                        st.dataframe(rows, use_container_width=True, hide_index=True)
+                        if not smtp_pending:
+                            with st.expander("EHLO capabilities"):
+                                for (mx_host, port), res in sorted(smtp_results.items()):
+                                    if res['esmtp']:
+                                        st.text(f"{mx_host}:{port}  " + ", ".join(res['esmtp']))
+                    
+                    if not smtp_pending:
+                        for mx_host in dict.fromkeys(h for h, _ in smtp_results):
+                            host_results = [r for (h, _), r in smtp_results.items() if h == mx_host]
+                            if all(r['error'] for r in host_results):
+                                warnings.append(f"Mail server {mx_host} not reachable on 25/587/465")
+                            elif smtp_results.get((mx_host, 25), {}).get('error'):
+                                warnings.append(f"{mx_host} not reachable on port 25 (may be blocked from this network)")
+                            certs = [r['tls'] for r in host_results if r['tls']]
+                            if any(c['days_left'] is not None and c['days_left'] < 0 for c in certs):
+                                issues.append(f"Mail server certificate on {mx_host} has expired")
+                            elif any(c['days_left'] is not None and c['days_left'] < 14 for c in certs):
+                                warnings.append(f"Mail server certificate on {mx_host} expires within 14 days")
+                            if smtp_results.get((mx_host, 25), {}).get('starttls') is False:
+                                warnings.append(f"{mx_host} does not offer STARTTLS on port 25")
+                        if any(not r['error'] for r in smtp_results.values()):
+                            success_checks.append("Mail servers accept connections")
+                
+                # Reverse DNS of one address, or of all addresses of one MX host
+                elif isinstance(key, tuple) and key[0] == 'rDNS':
+                    if error:
+                        # Only MX hosts can fail here: their own addresses didn't resolve
+                        rdns_results[key[1]] = [{'ip': '?', 'host': key[1], 'ptr': [], 'confirmed': False,
+                                                 'matches_host': None, 'error': str(error)}]
                     else:
-                        warnings.append("No SOA record")
-                        st.warning("⚠️ No SOA record found")
-                except:
-                    pass
-
-                # Summary Report
-                st.divider()
-                st.subheader("📊 DNS Health Summary")
+                        rdns_results[key[1]] = answers[key] if isinstance(answers[key], list) else [answers[key]]
+                    for res in rdns_results[key[1]]:
+                        if not res['host'] or res['error']:
+                            continue
+                        # Receivers check the PTR of mail servers; a web server can do without
+                        if not res['ptr']:
+                            warnings.append(f"Mail server {res['host']} ({res['ip']}) has no PTR record")
+                        elif not res['confirmed']:
+                            warnings.append(f"PTR of mail server {res['ip']} ({res['ptr'][0]}) does not resolve back to it")
+                        elif not res['matches_host']:
+                            warnings.append(f"PTR of {res['ip']} is {res['ptr'][0]}, not MX host {res['host']}")
+                    
+                    rdns_pending = sum(1 for k in futures.values() if k[0] == 'rDNS') - len(rdns_results)
+                    with rdns_slot.container():
+                        st.markdown("**🔁 Reverse DNS (PTR)**")
+                        if rdns_pending:
+                            st.caption(f"⏳ {rdns_pending} lookup(s) still running...")
+                        rows = []
+                        for res in (r for checks in rdns_results.values() for r in checks):
+                            rows.append({
+                                'IP': res['ip'],
+                                'Used by': f"MX {res['host']}" if res['host'] else "website",
+                                'PTR': ', '.join(res['ptr']) or ('error' if res['error'] else '❌ none'),
+                                'Forward-confirmed': '✅' if res['confirmed'] else '❌',
+                                'Matches MX host': {True: '✅', False: '⚠️', None: '-'}[res['matches_host']],
+                            })
+                        if rows:
+                            st.dataframe(rows, use_container_width=True, hide_index=True)
                 
-                if not issues and not warnings:
-                    st.success("🎉 **All DNS checks passed!** Domain is properly configured.")
-                    st.balloons()
-                else:
-                    col_a, col_b = st.columns(2)
-                    with col_a:
-                        if issues:
-                            st.markdown("**❌ Critical Issues:**")
-                            for msg in issues:
-                                st.error(f"• {msg}")
-                        if warnings:
-                            st.markdown("**⚠️ Warnings:**")
-                            for msg in warnings:
-                                st.warning(f"• {msg}")
-                    with col_b:
-                        if success_checks:
-                            st.markdown("**✅ Passed Checks:**")
-                            for msg in success_checks:
-                                st.success(f"• {msg}")
+                # DMARC needs both the root TXT and the _dmarc answers
+                if key in ('TXT', 'DMARC') and 'TXT' in answers and 'DMARC' in answers:
+                    with slots['DMARC'].container():
+                        txt_values = [r['data'].strip('"') for r in (answers['TXT'] or {}).get('Answer', [])]
+                        dmarc_answer = (answers['DMARC'] or {}).get('Answer')
+                        if dmarc_answer:
+                            st.success("🛡️ **DMARC Record Found (at _dmarc subdomain)**")
+                            st.code(dmarc_answer[0]['data'].strip('"'))
+                        elif not any(v.startswith('v=DMARC') for v in txt_values):
+                            warnings.append("No DMARC record (Domain vulnerable to spoofing)")
+                            st.warning("⚠️ No DMARC record found")
+                
+                # Summary Report, refreshed as each section lands
+                remaining = len(futures) - len(answers)
+                with summary_slot.container():
+                    st.subheader("📊 DNS Health Summary")
+                    if remaining:
+                        st.caption(f"⏳ {remaining} check(s) still running...")
+                    
+                    if not issues and not warnings:
+                        if not remaining:
+                            st.success("🎉 **All DNS checks passed!** Domain is properly configured.")
+                            st.balloons()
+                    else:
+                        col_a, col_b = st.columns(2)
+                        with col_a:
+                            if issues:
+                                st.markdown("**❌ Critical Issues:**")
+                                for msg in issues:
+                                    st.error(f"• {msg}")
+                            if warnings:
+                                st.markdown("**⚠️ Warnings:**")
+                                for msg in warnings:
+                                    st.warning(f"• {msg}")
+                        with col_b:
+                            if success_checks:
+                                st.markdown("**✅ Passed Checks:**")
+                                for msg in success_checks:
+                                    st.success(f"• {msg}")
         else:
             st.warning("⚠️ Please enter a domain name")
 
@@ -605,10 +857,12 @@ elif tool == "WHOIS":
     st.markdown("Check domain registration, expiration, status, and registrar information")
     
     domain = st.text_input("Enter domain name:", placeholder="example.com", key="whois_domain")
+    refresh_whois = st.checkbox("Skip cached results (re-query the registry)", value=False, key="whois_refresh")
     
     if st.button("🔍 Check WHOIS", use_container_width=True):
         if domain:
-            domain = domain.strip().lower()
+            # Registries only know the registered domain, not www. or other hosts under it
+            domain = registrable_domain(domain)
             
             with st.spinner(f"Performing WHOIS lookup for {domain}..."):
                 issues = []
@@ -618,10 +872,16 @@ elif tool == "WHOIS":
                 st.subheader("📝 Domain Registration Information")
                 
                 try:
-                    w = whois.whois(domain)
+                    whois_future = run('whois', domain, refresh=refresh_whois)
+                    warm(domain, exclude='whois', owner=st.session_state.session_id)
+                    w = whois_future.result()
                     
                     if w and w.domain_name:
                         st.success("✅ WHOIS information retrieved successfully")
+                        if w.source == 'RDAP':
+                            st.caption(f"Source: RDAP ({w.server}) - structured registry data")
+                        else:
+                            st.caption("Source: port-43 WHOIS (registry has no working RDAP service)")
                         success_checks.append("WHOIS lookup successful")
                         
                         col1, col2 = st.columns(2)
@@ -713,7 +973,7 @@ elif tool == "WHOIS":
                         
                         # Full WHOIS data
                         with st.expander("📄 View Full Raw WHOIS Data"):
-                            st.json(str(w))
+                            st.json(w.raw)
                         
                         # Summary
                         st.divider()
@@ -741,12 +1001,62 @@ elif tool == "WHOIS":
                         st.error("❌ Could not retrieve WHOIS information")
                         st.info(f"Try manual lookup at: https://who.is/whois/{domain}")
                         
+                except DomainNotFound as e:
+                    st.error(f"❌ {str(e)}")
+                    st.info("💡 The domain appears to be available for registration, or was deleted")
+                        
                 except Exception as e:
                     st.error(f"❌ WHOIS lookup failed: {type(e).__name__}")
                     st.warning("Some domains (especially ccTLDs) may not return complete WHOIS data via automated tools.")
                     st.info(f"**Try manual lookup:**\n- https://who.is/whois/{domain}\n- https://lookup.icann.org/en/lookup?name={domain}")
         else:
             st.warning("⚠️ Please enter a domain name")
+    
+    st.divider()
+    with st.expander("📋 Bulk WHOIS Audit (expiry / registrar)"):
+        st.caption("One domain per line. Lookups are queued per registry WHOIS server, so each registry "
+                   "is queried at a pace it tolerates while different registries run in parallel.")
+        bulk_domains = st.text_area("Domains:", height=150, placeholder="example.com\nexample.co.za", key="whois_bulk")
+        
+        if st.button("🔍 Run Bulk Audit", use_container_width=True, key="whois_bulk_btn"):
+            domains = list(dict.fromkeys(registrable_domain(d) for d in bulk_domains.splitlines() if d.strip()))
+            if domains:
+                progress = st.progress(0.0, text=f"0/{len(domains)} done")
+                table = st.empty()
+                rows = []
+                last_draw = 0.0
+                for i, (d, entry, error) in enumerate(get_scheduler().map(domains), 1):
+                    row = {'Domain': d, 'Registrar': None, 'Expires': None, 'Days Left': None, 'Status': None, 'Error': None}
+                    if error:
+                        row['Error'] = f"{type(error).__name__}: {error}"[:120]
+                    else:
+                        # python-whois dates can be timezone-aware
+                        exp = naive_utc(entry.expiration_date[0] if isinstance(entry.expiration_date, list) else entry.expiration_date)
+                        status = entry.status[0] if isinstance(entry.status, list) else entry.status
+                        row['Registrar'] = entry.registrar
+                        if isinstance(exp, datetime):
+                            row['Expires'] = str(exp).split()[0]
+                            row['Days Left'] = (exp - datetime.now()).days
+                        row['Status'] = str(status).split()[0] if status else None
+                    rows.append(row)
+                    
+                    # Redraw at most twice a second so long lists stay responsive
+                    if i == len(domains) or time.monotonic() - last_draw > 0.5:
+                        progress.progress(i / len(domains), text=f"{i}/{len(domains)} done")
+                        table.dataframe(sorted(rows, key=lambda r: (r['Days Left'] is None, r['Days Left'] or 0)),
+                                        use_container_width=True)
+                        last_draw = time.monotonic()
+                
+                expiring = [r for r in rows if r['Days Left'] is not None and r['Days Left'] < 30]
+                if expiring:
+                    st.error(f"❌ {len(expiring)} domain(s) expire within 30 days or have expired")
+                failed = [r for r in rows if r['Error']]
+                if failed:
+                    st.warning(f"⚠️ {len(failed)} lookup(s) failed - retry later or check manually at https://who.is")
+                st.caption("Per-registry pacing: " + ", ".join(
+                    f"{s['server']} every {s['interval_s']}s" for s in get_scheduler().stats()))
+            else:
+                st.warning("⚠️ Please enter at least one domain")
 
 elif tool == "IP":
     st.header("🔍 IP Address Lookup")
@@ -763,33 +1073,8 @@ elif tool == "IP":
             else:
                 with st.spinner(f"Looking up {ip}..."):
                     try:
-                        # Try primary API
-                        geo_data = None
-                        try:
-                            response = requests.get(f"https://ipapi.co/{ip}/json/", timeout=5)
-                            if response.status_code == 200:
-                                geo_data = response.json()
-                        except:
-                            pass
-                        
-                        # Fallback API
-                        if not geo_data or geo_data.get('error'):
-                            response = requests.get(f"http://ip-api.com/json/{ip}", timeout=5)
-                            if response.status_code == 200:
-                                fallback = response.json()
-                                if fallback.get('status') == 'success':
-                                    geo_data = {
-                                        'ip': ip,
-                                        'city': fallback.get('city'),
-                                        'region': fallback.get('regionName'),
-                                        'country_name': fallback.get('country'),
-                                        'postal': fallback.get('zip'),
-                                        'latitude': fallback.get('lat'),
-                                        'longitude': fallback.get('lon'),
-                                        'org': fallback.get('isp'),
-                                        'timezone': fallback.get('timezone'),
-                                        'asn': fallback.get('as')
-                                    }
+                        # Providers are tried best-first; throttled or failing ones are skipped
+                        geo_data = run('ip', ip).result()
                         
                         if geo_data and not geo_data.get('error'):
                             st.success(f"✅ Information found for {ip}")
@@ -860,146 +1145,200 @@ elif tool == "SSL":
     st.header("🔒 Comprehensive SSL Certificate Checker")
     st.markdown("Verify SSL certificate validity, expiration, and check for mixed content issues")
     
-    domain_ssl = st.text_input("Enter domain (without https://):", placeholder="example.com", key="ssl_domain")
+    domain_ssl = st.text_input("Enter domain (without https://):", placeholder="example.com or example.com:2083", key="ssl_domain")
+    check_www = st.checkbox("Also check the www / apex variant", value=True, key="ssl_check_www")
+    check_ocsp = st.checkbox("Check OCSP stapling (one more handshake per host)", value=False, key="ssl_check_ocsp")
+    refresh_ssl = st.checkbox("Skip cached results (e.g. right after installing a certificate)", value=False, key="ssl_refresh")
     
     if st.button("🔍 Check SSL Certificate", use_container_width=True):
         if domain_ssl:
-            domain_ssl = domain_ssl.replace('https://', '').replace('http://', '').replace('www.', '').split('/')[0].strip()
+            domain_ssl = domain_ssl.replace('https://', '').replace('http://', '').split('/')[0].strip().lower()
+            apex_ssl = domain_ssl[4:] if domain_ssl.startswith('www.') else domain_ssl
+            hosts_ssl = [apex_ssl, f"www.{apex_ssl}"] if check_www else [domain_ssl]
             
-            with st.spinner(f"Analyzing SSL certificate for {domain_ssl}..."):
-                try:
-                    # SSL Certificate Check
-                    context = ssl.create_default_context()
-                    with socket.create_connection((domain_ssl, 443), timeout=10) as sock:
-                        with context.wrap_socket(sock, server_hostname=domain_ssl) as secure_sock:
-                            cert = secure_sock.getpeercert()
-                            
-                            st.success(f"✅ SSL Certificate found and valid for {domain_ssl}")
-                            
-                            col1, col2 = st.columns(2)
-                            
-                            with col1:
-                                st.subheader("📋 Certificate Details")
-                                
-                                subject = dict(x[0] for x in cert['subject'])
-                                st.write("**Issued To:**", subject.get('commonName', 'N/A'))
-                                
-                                issuer = dict(x[0] for x in cert['issuer'])
-                                st.write("**Issued By:**", issuer.get('commonName', 'N/A'))
-                                st.write("**Organization:**", issuer.get('organizationName', 'N/A'))
-                            
-                            with col2:
-                                st.subheader("📅 Validity Period")
-                                
-                                not_before = cert.get('notBefore')
-                                not_after = cert.get('notAfter')
-                                
-                                st.write("**Valid From:**", not_before)
-                                st.write("**Valid Until:**", not_after)
-                                
-                                if not_after:
-                                    try:
-                                        expiry_date = datetime.strptime(not_after, '%b %d %H:%M:%S %Y %Z')
-                                        days_remaining = (expiry_date - datetime.now()).days
-                                        
-                                        if days_remaining > 30:
-                                            st.success(f"✅ **{days_remaining} days** remaining")
-                                        elif days_remaining > 0:
-                                            st.warning(f"⚠️ **{days_remaining} days** remaining - Renew soon!")
-                                        else:
-                                            st.error(f"❌ Certificate expired {abs(days_remaining)} days ago")
-                                    except:
-                                        pass
-                            
-                            # Subject Alternative Names
-                            if 'subjectAltName' in cert:
-                                st.subheader("🌐 Subject Alternative Names (Covered Domains)")
-                                sans = [san[1] for san in cert['subjectAltName']]
-                                
-                                for san in sans[:10]:
-                                    st.code(san)
-                                
-                                if len(sans) > 10:
-                                    st.info(f"...and {len(sans) - 10} more domain(s)")
-                            
-                            # Mixed Content Check
-                            st.subheader("🔍 Mixed Content Check")
-                            with st.spinner("Checking for mixed content issues..."):
-                                try:
-                                    # Fetch the homepage
-                                    response = requests.get(f"https://{domain_ssl}", timeout=10, verify=True)
-                                    content = response.text
-                                    
-                                    # Check for HTTP resources
-                                    http_resources = re.findall(r'http://[^"\'\s<>]+', content)
-                                    
-                                    if http_resources:
-                                        st.warning(f"⚠️ **Found {len(http_resources)} potential mixed content issue(s)**")
-                                        st.caption("Mixed content occurs when HTTPS pages load HTTP resources (images, scripts, etc.)")
-                                        
-                                        # Show first few examples
-                                        st.markdown("**Examples:**")
-                                        for resource in http_resources[:5]:
-                                            st.code(resource)
-                                        
-                                        if len(http_resources) > 5:
-                                            st.info(f"...and {len(http_resources) - 5} more HTTP resources")
-                                        
-                                        st.markdown("""
-                                        **How to fix:**
-                                        1. Change all `http://` to `https://` in your HTML/CSS
-                                        2. Use protocol-relative URLs: `//example.com/image.jpg`
-                                        3. Update your CMS/theme settings to use HTTPS
-                                        """)
-                                    else:
-                                        st.success("✅ No mixed content issues detected!")
-                                        st.caption("All resources are loaded securely via HTTPS")
-                                except Exception as e:
-                                    st.warning(f"⚠️ Could not check for mixed content: {str(e)}")
-                            
-                            # Certificate summary
-                            with st.expander("🔍 View Complete Certificate Summary"):
-                                summary = {
-                                    'Common Name': subject.get('commonName', 'N/A'),
-                                    'Issuer': issuer.get('commonName', 'N/A'),
-                                    'Issuer Organization': issuer.get('organizationName', 'N/A'),
-                                    'Valid From': not_before,
-                                    'Valid Until': not_after,
-                                    'Serial Number': cert.get('serialNumber', 'N/A'),
-                                    'Version': cert.get('version', 'N/A'),
-                                    'Total SANs': len(sans) if 'subjectAltName' in cert else 0
-                                }
-                                
-                                for key, value in summary.items():
-                                    st.text(f"{key}: {value}")
-                                
-                                st.divider()
+            with st.spinner(f"Analyzing SSL certificate for {', '.join(hosts_ssl)}..."):
+                # One TLS connection per host, hosts checked concurrently
+                ssl_futures = [] if check_ocsp else [run('ssl', h, refresh=refresh_ssl) for h in hosts_ssl]
+                warm(apex_ssl.split(':')[0], exclude='ssl', owner=st.session_state.session_id)
+                if check_ocsp:
+                    ssl_results = inspect_hosts(hosts_ssl, ocsp=True, refresh=refresh_ssl)
+                else:
+                    ssl_results = [future.result() for future in ssl_futures]
+            
+            for tab, res in zip(st.tabs([f"🔒 {r['host']}" for r in ssl_results]), ssl_results):
+                with tab:
+                    host = res['host']
+                    
+                    if res['error_type'] == 'dns':
+                        st.error(f"❌ Could not resolve domain: {host}")
+                        st.info("💡 Make sure the domain name is correct and accessible")
+                        continue
+                    elif res['error_type'] == 'timeout':
+                        st.error(f"⏱️ Connection timeout for {host}")
+                        st.info("💡 The server might be slow or blocking connections")
+                        continue
+                    elif res['error_type'] == 'ssl':
+                        st.error(f"❌ SSL Error: {res['error']}")
+                        st.warning("""
+                        **Common SSL Issues:**
+                        - Certificate has expired
+                        - Certificate is self-signed
+                        - Certificate name doesn't match domain
+                        - Incomplete certificate chain
+                        - Mixed content blocking
+                        """)
+                        continue
+                    elif res['error']:
+                        st.error(f"❌ Error checking SSL: {res['error']}")
+                        st.info(f"💡 Try checking manually at: https://www.ssllabs.com/ssltest/analyze.html?d={host}")
+                        continue
+                    
+                    cert = res['cert']
+                    if res['verified']:
+                        st.success(f"✅ SSL Certificate found and valid for {host}")
+                    else:
+                        st.error(f"❌ Certificate is NOT trusted by browsers: {res['verify_error']}")
+                        st.caption("Details below were read without verification so you can see what the server presents")
+                    
+                    col1, col2 = st.columns(2)
+                    
+                    with col1:
+                        st.subheader("📋 Certificate Details")
+                        
+                        subject = dict(x[0] for x in cert.get('subject', ()))
+                        st.write("**Issued To:**", subject.get('commonName', 'N/A'))
+                        
+                        issuer = dict(x[0] for x in cert.get('issuer', ()))
+                        st.write("**Issued By:**", issuer.get('commonName', 'N/A'))
+                        st.write("**Organization:**", issuer.get('organizationName', 'N/A'))
+                    
+                    with col2:
+                        st.subheader("📅 Validity Period")
+                        
+                        not_before = cert.get('notBefore')
+                        not_after = cert.get('notAfter')
+                        
+                        st.write("**Valid From:**", not_before)
+                        st.write("**Valid Until:**", not_after)
+                        
+                        if not_after:
+                            try:
+                                expiry_date = datetime.strptime(not_after, '%b %d %H:%M:%S %Y %Z')
+                                days_remaining = (expiry_date - datetime.now()).days
                                 
-                                with st.expander("📄 Show Technical/Raw Certificate Data"):
-                                    st.json(cert)
+                                if days_remaining > 30:
+                                    st.success(f"✅ **{days_remaining} days** remaining")
+                                elif days_remaining > 0:
+                                    st.warning(f"⚠️ **{days_remaining} days** remaining - Renew soon!")
+                                else:
+                                    st.error(f"❌ Certificate expired {abs(days_remaining)} days ago")
+                            except:
+                                pass
+                    
+                    # Subject Alternative Names
+                    sans = [san[1] for san in cert.get('subjectAltName', ())]
+                    if sans:
+                        st.subheader("🌐 Subject Alternative Names (Covered Domains)")
                         
-                except socket.gaierror:
-                    st.error(f"❌ Could not resolve domain: {domain_ssl}")
-                    st.info("💡 Make sure the domain name is correct and accessible")
+                        for san in sans[:10]:
+                            st.code(san)
+                        
+                        if len(sans) > 10:
+                            st.info(f"...and {len(sans) - 10} more domain(s)")
                     
-                except socket.timeout:
-                    st.error(f"⏱️ Connection timeout for {domain_ssl}")
-                    st.info("💡 The server might be slow or blocking connections")
+                    # Chain and protocol
+                    st.subheader("🔗 Certificate Chain & Connection")
+                    for depth, link in enumerate(res['chain']):
+                        st.code(f"{depth}: {link['subject']}  ←  issued by {link['issuer']} (expires {link['not_after']})")
+                    if len(res['chain']) == 1 and res['chain'][0]['subject'] != res['chain'][0]['issuer']:
+                        st.warning("⚠️ Server sends only the leaf certificate - chain may be incomplete on some devices")
                     
-                except ssl.SSLError as ssl_err:
-                    st.error(f"❌ SSL Error: {str(ssl_err)}")
-                    st.warning("""
-                    **Common SSL Issues:**
-                    - Certificate has expired
-                    - Certificate is self-signed
-                    - Certificate name doesn't match domain
-                    - Incomplete certificate chain
-                    - Mixed content blocking
-                    """)
+                    col3, col4, col5 = st.columns(3)
+                    with col3:
+                        st.metric("🔐 Protocol", res['protocol'] or 'N/A')
+                        st.caption(f"Cipher: {res['cipher']} ({res['cipher_bits']} bits)")
+                    with col4:
+                        timings = res['timings']
+                        st.metric("🤝 Handshake", f"{timings.get('tls_ms', 'N/A')} ms")
+                        st.caption(f"TCP connect: {timings.get('tcp_ms', 'N/A')} ms")
+                        if 'session_reused' in timings:
+                            reused = "✅ resumed" if timings['session_reused'] else "❌ not resumed"
+                            st.caption(f"Session reuse: {reused} ({timings['resumed_tls_ms']} ms)")
+                        st.caption(f"TLS handshakes for this check: {res['handshakes']}")
+                    with col5:
+                        stapled = res['ocsp']['stapled']
+                        st.metric("📎 OCSP Stapling", {True: "Yes", False: "No", None: "Unknown"}[stapled])
+                        if res['ocsp']['responders']:
+                            st.caption(f"Responder: {res['ocsp']['responders'][0]}")
+                        if not check_ocsp:
+                            st.caption("Not checked - tick \"Check OCSP stapling\" above")
+                        elif not res['ocsp']['responders']:
+                            st.caption("Certificate names no OCSP responder")
+                        elif not res['ocsp']['checked']:
+                            st.caption("Install pyOpenSSL to check stapling")
                     
-                except Exception as e:
-                    st.error(f"❌ Error checking SSL: {str(e)}")
-                    st.info(f"💡 Try checking manually at: https://www.ssllabs.com/ssltest/analyze.html?d={domain_ssl}")
+                    if res['protocol'] in ('TLSv1', 'TLSv1.1'):
+                        st.warning(f"⚠️ {res['protocol']} is deprecated - modern browsers will refuse this connection")
+                    
+                    # Mixed Content Check (homepage fetched over the same connection)
+                    st.subheader("🔍 Mixed Content Check")
+                    page = res['http'] or {}
+                    if page.get('error'):
+                        st.warning(f"⚠️ Could not check for mixed content: {page['error']}")
+                    elif page:
+                        for hop in page['redirects']:
+                            st.caption(f"↪️ {hop['path']} → {hop['status']} {hop['location']}")
+                        if page['status'] in (301, 302, 303, 307, 308):
+                            st.info(f"ℹ️ Homepage redirects to {page['location']} - check that host for mixed content")
+                        elif page['status'] >= 400:
+                            st.warning(f"⚠️ Homepage returned HTTP {page['status']} {page['reason']}")
+                        
+                        http_resources = page['mixed_content']
+                        if http_resources:
+                            st.warning(f"⚠️ **Found {len(http_resources)} potential mixed content issue(s)**")
+                            st.caption("Mixed content occurs when HTTPS pages load HTTP resources (images, scripts, etc.)")
+                            
+                            # Show first few examples
+                            st.markdown("**Examples:**")
+                            for resource in http_resources[:5]:
+                                st.code(resource)
+                            
+                            if len(http_resources) > 5:
+                                st.info(f"...and {len(http_resources) - 5} more HTTP resources")
+                            
+                            st.markdown("""
+                            **How to fix:**
+                            1. Change all `http://` to `https://` in your HTML/CSS
+                            2. Use protocol-relative URLs: `//example.com/image.jpg`
+                            3. Update your CMS/theme settings to use HTTPS
+                            """)
+                        elif page['status'] < 300:
+                            st.success("✅ No mixed content issues detected!")
+                            st.caption("All resources are loaded securely via HTTPS")
+                    
+                    # Certificate summary
+                    with st.expander("🔍 View Complete Certificate Summary"):
+                        summary = {
+                            'Common Name': subject.get('commonName', 'N/A'),
+                            'Issuer': issuer.get('commonName', 'N/A'),
+                            'Issuer Organization': issuer.get('organizationName', 'N/A'),
+                            'Valid From': not_before,
+                            'Valid Until': not_after,
+                            'Serial Number': cert.get('serialNumber', 'N/A'),
+                            'Version': cert.get('version', 'N/A'),
+                            'Total SANs': len(sans),
+                            'Protocol': res['protocol'],
+                            'Cipher': res['cipher'],
+                            'Chain Length': len(res['chain'])
+                        }
+                        
+                        for key, value in summary.items():
+                            st.text(f"{key}: {value}")
+                        
+                        st.divider()
+                        
+                        with st.expander("📄 Show Technical/Raw Certificate Data"):
+                            st.json(cert)
         else:
             st.warning("⚠️ Please enter a domain name")
 
@@ -1020,3 +1359,128 @@ elif tool == "Flush":
         st.info("Use this to force Google DNS to fetch fresh DNS records for a domain")
     with col2:
         st.link_button("🧹 Flush Cache", "https://dns.google/cache", use_container_width=True)
+
+elif tool == "Export":
+    st.header("📤 Bulk Diagnostic Export")
+    st.markdown("Run DNS, WHOIS, SSL and IP checks over a list of domains and IPs and download the results")
+    st.caption("Rows are written to disk as each check finishes, so long lists don't pile up in memory. "
+               "For very large audits use the command line: `python export.py domains.txt -o audit.parquet`")
+    
+    uploaded = st.file_uploader("Upload a list (one domain or IP per line):", type=['txt', 'csv'], key="export_file")
+    pasted = st.text_area("...or paste it:", height=150, placeholder="example.com\n8.8.8.8", key="export_targets")
+    col1, col2 = st.columns(2)
+    with col1:
+        export_checks = st.multiselect("Checks:", CHECKS, default=['dns', 'whois', 'ssl'], key="export_checks")
+    with col2:
+        export_format = st.selectbox("Format:", available_formats(), key="export_format")
+    if 'parquet' not in available_formats():
+        st.caption("Parquet export needs pyarrow installed")
+    
+    if st.button("▶️ Run Export", use_container_width=True, key="export_btn"):
+        if uploaded is not None:
+            targets = (line.decode('utf-8', errors='replace') for line in uploaded)
+        else:
+            targets = pasted.splitlines()
+        if not export_checks:
+            st.warning("⚠️ Please choose at least one check")
+        elif uploaded is None and not pasted.strip():
+            st.warning("⚠️ Please upload or paste at least one domain or IP")
+        else:
+            # Replace this session's previous export file
+            old_path = st.session_state.get('export_path')
+            if old_path and os.path.exists(old_path):
+                os.remove(old_path)
+            fd, path = tempfile.mkstemp(suffix=f".{EXPORTERS[export_format].extension}", prefix="audit-")
+            os.close(fd)
+            
+            status_line = st.empty()
+            levels = {'ok': 0, 'warn': 0, 'error': 0}
+            last_draw = [0.0]
+            
+            def show_progress(count, row):
+                levels[row['level']] = levels.get(row['level'], 0) + 1
+                if time.monotonic() - last_draw[0] > 0.5:
+                    status_line.caption(f"⏳ {count} checks written · ✅ {levels['ok']} · "
+                                        f"⚠️ {levels['warn']} · ❌ {levels['error']}")
+                    last_draw[0] = time.monotonic()
+            
+            count = export(audit(targets, export_checks), path, export_format, show_progress)
+            status_line.empty()
+            st.session_state.export_path = path
+            st.session_state.export_summary = (count, dict(levels), export_format)
+    
+    export_path = st.session_state.get('export_path')
+    if export_path and os.path.exists(export_path):
+        count, levels, fmt = st.session_state.export_summary
+        st.success(f"✅ {count} checks exported · ✅ {levels['ok']} ok · "
+                   f"⚠️ {levels['warn']} warnings · ❌ {levels['error']} errors")
+        with open(export_path, 'rb') as f:
+            st.download_button(f"⬇️ Download {fmt.upper()} ({os.path.getsize(export_path) // 1024 + 1} KB)", f,
+                               file_name=f"audit-{datetime.now():%Y%m%d-%H%M}.{EXPORTERS[fmt].extension}",
+                               mime=EXPORTERS[fmt].mime, use_container_width=True, key="export_download")
+
+elif tool == "Website":
+    st.header("🌍 Website Reachability")
+    st.markdown("Time DNS, connect, TLS, server response and download for the apex and www, over HTTP and HTTPS")
+    
+    domain_web = st.text_input("Enter domain:", placeholder="example.com", key="web_domain")
+    
+    if st.button("🔍 Check Website", use_container_width=True, key="web_btn"):
+        if domain_web:
+            domain_web = domain_web.replace('https://', '').replace('http://', '').split('/')[0].strip().lower()
+            web_futures = check_site(domain_web)
+            
+            overview_slot = st.empty()
+            findings_slot = st.empty()
+            results = {}
+            urls = {f: url for url, f in web_futures.items()}
+            for future in as_completed(urls):
+                results[urls[future]] = future.result()
+                
+                rows = []
+                for url in web_futures:
+                    res = results.get(url)
+                    if res is None:
+                        rows.append({'URL': url, 'Result': '⏳ running...'})
+                        continue
+                    final = res['final']
+                    first = res['hops'][0]['timings']
+                    rows.append({
+                        'URL': url,
+                        'Result': {'ok': f"✅ {final['status']}", 'error': f"❌ {final['error_type']}",
+                                   'redirect_loop': "🔁 loop", 'too_many_redirects': "❌ too many redirects"}[res['outcome']],
+                        'Ends at': final['url'],
+                        'Hops': len(res['hops']),
+                        'DNS ms': first['dns_ms'],
+                        'TCP ms': first['tcp_ms'],
+                        'TLS ms': first['tls_ms'],
+                        'TTFB ms': first['ttfb_ms'],
+                        'Transfer ms': first['transfer_ms'],
+                        'Total ms': res['total_ms'],
+                    })
+                overview_slot.dataframe(rows, use_container_width=True, hide_index=True)
+            
+            with findings_slot.container():
+                st.subheader("📊 Findings")
+                for level, text in findings(results):
+                    {'ok': st.success, 'warn': st.warning, 'error': st.error}[level](text)
+            
+            st.subheader("↪️ Redirect Chains")
+            st.caption("Timings of the first hop are shown above; every hop is timed on its own connection")
+            for url, res in results.items():
+                with st.expander(f"{url} → {res['final']['url']} ({len(res['hops'])} hop(s), {res['total_ms']:.0f} ms)"):
+                    st.dataframe([{
+                        'Hop': i,
+                        'URL': hop['url'],
+                        'IP': hop['ip'],
+                        'Status': hop['status'] or hop['error_type'],
+                        'Location': hop['location'] or hop['error'],
+                        'DNS ms': hop['timings']['dns_ms'],
+                        'TCP ms': hop['timings']['tcp_ms'],
+                        'TLS ms': hop['timings']['tls_ms'],
+                        'TTFB ms': hop['timings']['ttfb_ms'],
+                        'Transfer ms': hop['timings']['transfer_ms'],
+                        'Bytes': hop['bytes'],
+                    } for i, hop in enumerate(res['hops'], 1)], use_container_width=True, hide_index=True)
+        else:
+            st.warning("⚠️ Please enter a domain name")
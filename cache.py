@@ -0,0 +1,375 @@
+"""TTL caches for lookup results, in-process or shared between app replicas.
+
+``TTLCache`` lives in the process. ``SQLiteCache`` keeps entries in a SQLite
+file in WAL mode, so every Streamlit process on the same host shares them,
+and ``RedisCache`` shares them across hosts. ``get_cache`` picks the backend
+from the CACHE_BACKEND environment variable (memory, sqlite or redis), so
+upstream traffic doesn't grow with the number of replicas.
+
+Shared backends store values as JSON (never pickle, so a writable cache
+can't run code in the app) and treat any backend failure as a cache miss: a
+locked database or unreachable Redis never fails a lookup. JSON brings back
+tuples as lists and dict subclasses as plain dicts; datetimes round-trip.
+"""
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime
+
+try:
+    import redis  # optional, only needed for CACHE_BACKEND=redis
+except ImportError:
+    redis = None
+
+CACHE_BACKEND = os.environ.get('CACHE_BACKEND', 'memory')
+CACHE_PATH = os.environ.get(
+    'CACHE_PATH',
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), '.cache', 'shared.sqlite3'))
+CACHE_URL = os.environ.get('CACHE_URL', 'redis://localhost:6379/0')
+
+# Larger values are not worth sharing (and would bloat the database)
+MAX_VALUE_BYTES = 1024 * 1024
+# Shared backends check their size limit every this many writes
+EVICT_EVERY = 32
+# Hits refresh an entry's LRU position at most this often, to keep reads cheap
+TOUCH_INTERVAL = 60
+# Redis entry counts walk the whole keyspace, so they are redone at most this often
+COUNT_INTERVAL = 300
+
+_MISSING = object()
+
+
+def _default(value):
+    if isinstance(value, datetime):
+        return {'__datetime__': value.isoformat()}
+    raise TypeError(f"{type(value).__name__} is not JSON serializable")
+
+
+def _object_hook(obj):
+    if len(obj) == 1 and '__datetime__' in obj:
+        return datetime.fromisoformat(obj['__datetime__'])
+    return obj
+
+
+def dumps(value):
+    """Encode a cache value for the shared backends"""
+    return json.dumps(value, default=_default, separators=(',', ':')).encode()
+
+
+def loads(data):
+    """Decode a value written by dumps()"""
+    return json.loads(data, object_hook=_object_hook)
+
+
+class _Stats:
+    """Hit/miss counters shared by every backend"""
+
+    backend = None
+
+    def _init_stats(self, namespace):
+        self.namespace = namespace
+        self.hits = 0
+        self.misses = 0
+        self.errors = 0
+
+    def _count(self, hit):
+        if hit:
+            self.hits += 1
+        else:
+            self.misses += 1
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {
+            'cache': self.namespace,
+            'backend': self.backend,
+            'entries': len(self),
+            'hit_rate': f"{self.hits / lookups:.0%}" if lookups else "-",
+            'hits': self.hits,
+            'misses': self.misses,
+            'errors': self.errors,
+        }
+
+
+class TTLCache(_Stats):
+    """Thread-safe LRU cache whose entries expire after `ttl` seconds"""
+
+    backend = 'memory'
+
+    def __init__(self, maxsize=1024, ttl=300, namespace=None):
+        self._init_stats(namespace)
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.data = OrderedDict()  # key -> (expires_at, value)
+        self.lock = threading.Lock()
+
+    def get(self, key, default=None):
+        with self.lock:
+            entry = self.data.get(key, _MISSING)
+            if entry is not _MISSING and entry[0] < time.monotonic():
+                del self.data[key]
+                entry = _MISSING
+            self._count(entry is not _MISSING)
+            if entry is _MISSING:
+                return default
+            self.data.move_to_end(key)
+            return entry[1]
+
+    def set(self, key, value, ttl=None):
+        with self.lock:
+            self.data[key] = (time.monotonic() + (self.ttl if ttl is None else ttl), value)
+            self.data.move_to_end(key)
+            while len(self.data) > self.maxsize:
+                self.data.popitem(last=False)
+
+    def pop(self, key, default=None):
+        with self.lock:
+            entry = self.data.pop(key, _MISSING)
+        if entry is _MISSING or entry[0] < time.monotonic():
+            return default
+        return entry[1]
+
+    def clear(self):
+        with self.lock:
+            self.data.clear()
+
+    def __len__(self):
+        return len(self.data)
+
+
+class SQLiteCache(_Stats):
+    """LRU/TTL cache in a SQLite file shared by every process on the host.
+
+    Expiry uses wall-clock time since entries outlive the process that wrote
+    them. Each namespace is limited to `maxsize` entries; the least recently
+    used ones are evicted first.
+    """
+
+    backend = 'sqlite'
+
+    def __init__(self, maxsize=1024, ttl=300, namespace='default', path=None):
+        self._init_stats(namespace)
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.path = path or CACHE_PATH
+        self.local = threading.local()
+        self.writes = 0
+        self.lock = threading.Lock()
+        os.makedirs(os.path.dirname(self.path) or '.', exist_ok=True)
+        self._db().executescript("""
+            CREATE TABLE IF NOT EXISTS cache (
+                ns TEXT NOT NULL, key TEXT NOT NULL, value BLOB NOT NULL,
+                expires_at REAL NOT NULL, used_at REAL NOT NULL,
+                PRIMARY KEY (ns, key)
+            ) WITHOUT ROWID;
+            CREATE INDEX IF NOT EXISTS cache_lru ON cache (ns, used_at);
+        """)
+
+    def _db(self):
+        # sqlite3 connections can't be shared between threads
+        db = getattr(self.local, 'db', None)
+        if db is None:
+            db = sqlite3.connect(self.path, timeout=5, isolation_level=None)
+            db.execute("PRAGMA journal_mode=WAL")
+            db.execute("PRAGMA synchronous=NORMAL")
+            self.local.db = db
+        return db
+
+    def _failed(self):
+        with self.lock:
+            self.errors += 1
+
+    def get(self, key, default=None):
+        now = time.time()
+        try:
+            row = self._db().execute(
+                "SELECT value, expires_at, used_at FROM cache WHERE ns = ? AND key = ?",
+                (self.namespace, repr(key))).fetchone()
+            if row is not None and row[1] < now:
+                self._db().execute("DELETE FROM cache WHERE ns = ? AND key = ?", (self.namespace, repr(key)))
+                row = None
+            if row is not None and now - row[2] > TOUCH_INTERVAL:
+                self._db().execute("UPDATE cache SET used_at = ? WHERE ns = ? AND key = ?",
+                                   (now, self.namespace, repr(key)))
+            value = loads(row[0]) if row is not None else _MISSING
+        except (sqlite3.Error, ValueError):
+            self._failed()
+            value = _MISSING
+        with self.lock:
+            self._count(value is not _MISSING)
+        return default if value is _MISSING else value
+
+    def set(self, key, value, ttl=None):
+        now = time.time()
+        try:
+            data = dumps(value)
+        except (TypeError, ValueError):
+            self._failed()
+            return
+        if len(data) > MAX_VALUE_BYTES:
+            return
+        try:
+            self._db().execute(
+                "INSERT OR REPLACE INTO cache (ns, key, value, expires_at, used_at) VALUES (?, ?, ?, ?, ?)",
+                (self.namespace, repr(key), data, now + (self.ttl if ttl is None else ttl), now))
+        except sqlite3.Error:
+            self._failed()
+            return
+        with self.lock:
+            self.writes += 1
+            evict = self.writes % EVICT_EVERY == 0
+        if evict:
+            self.evict()
+
+    def evict(self):
+        """Drop expired entries, then the least recently used beyond `maxsize`"""
+        try:
+            db = self._db()
+            db.execute("DELETE FROM cache WHERE ns = ? AND expires_at < ?", (self.namespace, time.time()))
+            db.execute("""
+                DELETE FROM cache WHERE ns = ? AND key IN (
+                    SELECT key FROM cache WHERE ns = ? ORDER BY used_at DESC LIMIT -1 OFFSET ?
+                )""", (self.namespace, self.namespace, self.maxsize))
+        except sqlite3.Error:
+            self._failed()
+
+    def pop(self, key, default=None):
+        value = self.get(key, _MISSING)
+        if value is _MISSING:
+            return default
+        try:
+            self._db().execute("DELETE FROM cache WHERE ns = ? AND key = ?", (self.namespace, repr(key)))
+        except sqlite3.Error:
+            self._failed()
+        return value
+
+    def clear(self):
+        try:
+            self._db().execute("DELETE FROM cache WHERE ns = ?", (self.namespace,))
+        except sqlite3.Error:
+            self._failed()
+
+    def __len__(self):
+        try:
+            return self._db().execute("SELECT COUNT(*) FROM cache WHERE ns = ? AND expires_at >= ?",
+                                      (self.namespace, time.time())).fetchone()[0]
+        except sqlite3.Error:
+            return 0
+
+
+class RedisCache(_Stats):
+    """Cache on a Redis server, shared by replicas on any host.
+
+    Redis expires entries itself; the size limit and eviction come from the
+    server's maxmemory policy (use allkeys-lru or volatile-lru), so `maxsize`
+    is not enforced here. `client` accepts any object with redis-py's
+    get/set/delete/scan_iter methods, e.g. fakeredis or a local stand-in.
+    """
+
+    backend = 'redis'
+
+    def __init__(self, maxsize=1024, ttl=300, namespace='default', url=None, client=None, prefix='toolkit'):
+        self._init_stats(namespace)
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.prefix = f"{prefix}:{namespace}:"
+        self.lock = threading.Lock()
+        self.counted = None
+        self.counted_at = 0.0
+        self.counting = False
+        if client is None:
+            if redis is None:
+                raise RuntimeError("CACHE_BACKEND=redis needs the redis package (pip install redis)")
+            client = redis.Redis.from_url(url or CACHE_URL, socket_timeout=1, socket_connect_timeout=1)
+        self.client = client
+
+    def _failed(self):
+        with self.lock:
+            self.errors += 1
+
+    def get(self, key, default=None):
+        try:
+            data = self.client.get(self.prefix + repr(key))
+            value = loads(data) if data is not None else _MISSING
+        except Exception:
+            # Connection errors included: the cache must never fail a lookup
+            self._failed()
+            value = _MISSING
+        with self.lock:
+            self._count(value is not _MISSING)
+        return default if value is _MISSING else value
+
+    def set(self, key, value, ttl=None):
+        try:
+            data = dumps(value)
+            if len(data) <= MAX_VALUE_BYTES:
+                self.client.set(self.prefix + repr(key), data, ex=max(1, round(self.ttl if ttl is None else ttl)))
+        except Exception:
+            self._failed()
+
+    def pop(self, key, default=None):
+        value = self.get(key, _MISSING)
+        if value is _MISSING:
+            return default
+        try:
+            self.client.delete(self.prefix + repr(key))
+        except Exception:
+            self._failed()
+        return value
+
+    def clear(self):
+        try:
+            keys = list(self.client.scan_iter(match=self.prefix + '*'))
+            if keys:
+                self.client.delete(*keys)
+        except Exception:
+            self._failed()
+
+    def __len__(self):
+        """Entries as of the last count; a stale count is redone in the background"""
+        with self.lock:
+            stale = not self.counting and time.monotonic() - self.counted_at >= COUNT_INTERVAL
+            self.counting = self.counting or stale
+        if stale:
+            threading.Thread(target=self._count_entries, name="cache-count", daemon=True).start()
+        return self.counted or 0
+
+    def _count_entries(self):
+        try:
+            count = sum(1 for _ in self.client.scan_iter(match=self.prefix + '*'))
+        except Exception:
+            count = self.counted
+        with self.lock:
+            self.counted, self.counted_at, self.counting = count, time.monotonic(), False
+
+    def stats(self):
+        stats = super().stats()
+        stats['entries'] = '?' if self.counted is None else f"~{self.counted}"
+        return stats
+
+
+BACKENDS = {'memory': TTLCache, 'sqlite': SQLiteCache, 'redis': RedisCache}
+
+CACHES = {}
+_caches_lock = threading.Lock()
+
+
+def get_cache(namespace, maxsize=1024, ttl=300, backend=None):
+    """Cache for `namespace` on the configured backend (one instance per namespace)"""
+    with _caches_lock:
+        if namespace not in CACHES:
+            cls = BACKENDS[backend or CACHE_BACKEND]
+            try:
+                CACHES[namespace] = cls(maxsize=maxsize, ttl=ttl, namespace=namespace)
+            except Exception:
+                # A shared backend that can't start degrades to a per-process cache
+                CACHES[namespace] = TTLCache(maxsize=maxsize, ttl=ttl, namespace=namespace)
+        return CACHES[namespace]
+
+
+def snapshot():
+    """Hit rate and size of every shared-layer cache, for display"""
+    return [c.stats() for c in CACHES.values()]
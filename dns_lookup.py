@@ -0,0 +1,297 @@
+"""DNS-over-HTTPS lookups used by the DNS Analyzer."""
+import base64
+import itertools
+import ipaddress
+import re
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from urllib.parse import urlencode
+
+import providers
+from cache import get_cache
+
+# DNS-over-HTTPS JSON endpoints, in preferred fallback order
+DOH_RESOLVERS = {
+    'dns.google': "https://dns.google/resolve",
+    'cloudflare-dns.com': "https://cloudflare-dns.com/dns-query",
+}
+
+
+# Answers are shared for their record TTL, capped so fixes show up quickly
+DNS_CACHE_MAX_TTL = 300
+DNS_NEGATIVE_TTL = 60
+# Seconds a query waits for a rate limited resolver before giving up
+DOH_WAIT = 3
+
+_dns_cache = get_cache('dns', maxsize=8192, ttl=DNS_CACHE_MAX_TTL)
+
+
+def resolve(name, rtype, timeout=5):
+    """Query `name`/`rtype` and return the JSON answer (Google DoH format).
+
+    Resolvers are tried best-first; throttled or failing ones are skipped.
+    """
+    key = (name.lower(), rtype)
+    answer = _dns_cache.get(key)
+    if answer is None:
+        answer = _resolve(name, rtype, timeout)
+        # Only NOERROR and NXDOMAIN are real answers; SERVFAIL etc. are retried
+        if answer.get('Status') in (0, 3):
+            ttls = [r.get('TTL', DNS_CACHE_MAX_TTL) for r in answer.get('Answer') or []]
+            _dns_cache.set(key, answer, ttl=min(ttls + [DNS_CACHE_MAX_TTL]) if ttls else DNS_NEGATIVE_TTL)
+    return answer
+
+
+def _resolve(name, rtype, timeout):
+    query = urlencode({'name': name, 'type': rtype})
+    # A burst of queries (e.g. DKIM probes) waits briefly for tokens instead of failing
+    deadline = time.monotonic() + DOH_WAIT
+    while True:
+        # Empty straight away when every circuit is open, or once DOH_WAIT passes
+        order = providers.wait_ordered(DOH_RESOLVERS, deadline - time.monotonic())
+        if not order:
+            raise providers.ProviderUnavailable("No DNS resolver available (all throttled or failing)")
+        last_error = None
+        for resolver in order:
+            try:
+                response = providers.fetch(
+                    resolver, f"{DOH_RESOLVERS[resolver]}?{query}", timeout=timeout,
+                    headers={'Accept': 'application/dns-json'})
+                return response.json()
+            except providers.ProviderUnavailable as e:
+                last_error = last_error or e  # another caller took the token first
+            except Exception as e:
+                last_error = e
+        if not isinstance(last_error, providers.ProviderUnavailable) or time.monotonic() >= deadline:
+            raise last_error
+
+
+# DNS record type codes in DoH JSON answers
+TYPE_A = 1
+TYPE_CNAME = 5
+TYPE_PTR = 12
+TYPE_TXT = 16
+TYPE_AAAA = 28
+
+# Common DKIM selectors, most likely first; agents can add others in the tool.
+DKIM_SELECTORS = [
+    'default',                      # cPanel / DirectAdmin
+    'google',                       # Google Workspace
+    'selector1', 'selector2',       # Microsoft 365
+    'k1', 'k2',                     # Mailchimp / Mandrill
+    's1', 's2',                     # SendGrid
+    'dkim', 'mail',
+    'zoho',                         # Zoho Mail
+    'protonmail',
+    'fm1',                          # Fastmail
+    'hs1',                          # HubSpot
+    'mandrill', 'key1',
+]
+
+DKIM_PROBE_WORKERS = 16
+# Probes one analysis keeps in flight: the likeliest selectors go first, and
+# the rest are only sent while no key has been found
+DKIM_IN_FLIGHT = 6
+DKIM_CACHE_TTL = 120
+DKIM_NEGATIVE_TTL = 60
+
+_dkim_cache = get_cache('dkim', maxsize=4096, ttl=DKIM_CACHE_TTL)
+_dkim_pool = ThreadPoolExecutor(max_workers=DKIM_PROBE_WORKERS, thread_name_prefix="dkim-probe")
+_query_pool = ThreadPoolExecutor(max_workers=32, thread_name_prefix="dns-query")
+_rdns_pool = ThreadPoolExecutor(max_workers=16, thread_name_prefix="rdns")
+
+
+def txt_value(data):
+    """Join the character-strings of a TXT answer into one value"""
+    parts = re.findall(r'"((?:[^"\\]|\\.)*)"', data)
+    return ''.join(parts) if parts else data.strip('"')
+
+
+def _der_length(der, pos):
+    """Read a DER length at `pos`; returns (length, position after it)"""
+    first = der[pos]
+    if first < 0x80:
+        return first, pos + 1
+    size = first & 0x7f
+    return int.from_bytes(der[pos + 1:pos + 1 + size], 'big'), pos + 1 + size
+
+
+def _der_enter(der, pos, tag):
+    """Check the tag at `pos` and return (content start, content end)"""
+    if der[pos] != tag:
+        raise ValueError(f"unexpected DER tag {der[pos]:#x}")
+    length, start = _der_length(der, pos + 1)
+    return start, start + length
+
+
+def rsa_key_bits(spki):
+    """Modulus size of a DER SubjectPublicKeyInfo (or bare RSAPublicKey)"""
+    start, _ = _der_enter(spki, 0, 0x30)
+    if spki[start] == 0x30:
+        # SubjectPublicKeyInfo: skip AlgorithmIdentifier, enter the BIT STRING
+        _, alg_end = _der_enter(spki, start, 0x30)
+        bits_start, _ = _der_enter(spki, alg_end, 0x03)
+        start, _ = _der_enter(spki, bits_start + 1, 0x30)
+    mod_start, mod_end = _der_enter(spki, start, 0x02)
+    modulus = spki[mod_start:mod_end].lstrip(b'\x00')
+    if not modulus:
+        raise ValueError("empty RSA modulus")
+    return len(modulus) * 8
+
+
+def parse_dkim(record):
+    """Parse a DKIM key record into its tags plus key type, size and warnings"""
+    tags = {}
+    for part in record.split(';'):
+        if '=' in part:
+            key, value = part.split('=', 1)
+            tags[key.strip()] = re.sub(r'\s+', '', value)
+    key_type = tags.get('k', 'rsa').lower()
+    public_key = tags.get('p', '')
+    info = {
+        'tags': tags,
+        'key_type': key_type,
+        'key_bits': None,
+        'revoked': public_key == '',
+        'testing': 'y' in tags.get('t', '').split(':'),
+        'warnings': [],
+    }
+    if tags.get('v', 'DKIM1') != 'DKIM1':
+        info['warnings'].append(f"Unexpected version v={tags['v']}")
+    if info['revoked']:
+        info['warnings'].append("Key is revoked (empty p=)")
+        return info
+    try:
+        raw = base64.b64decode(public_key + '=' * (-len(public_key) % 4))
+        info['key_bits'] = 256 if key_type == 'ed25519' else rsa_key_bits(raw)
+    except Exception:
+        info['warnings'].append("Public key (p=) could not be decoded")
+        return info
+    if key_type == 'rsa' and info['key_bits'] < 1024:
+        info['warnings'].append(f"{info['key_bits']}-bit RSA key is too weak; receivers may ignore it")
+    if info['testing']:
+        info['warnings'].append("Testing mode (t=y): receivers may treat failures leniently")
+    return info
+
+
+def probe_dkim_selector(domain, selector):
+    """Look up one selector; result is cached for a short time"""
+    key = (domain, selector)
+    cached = _dkim_cache.get(key)
+    if cached is not None:
+        return cached
+    name = f"{selector}._domainkey.{domain}"
+    result = {'selector': selector, 'name': name, 'found': False, 'cname': None, 'record': None}
+    try:
+        answer = resolve(name, 'TXT')
+    except Exception as e:
+        # Not cached: the resolver may just be throttled
+        result['error'] = str(e)
+        return result
+    for r in answer.get('Answer', []):
+        if r.get('type') == TYPE_CNAME:
+            result['cname'] = r['data'].rstrip('.')
+        elif r.get('type') == TYPE_TXT:
+            value = txt_value(r['data'])
+            if 'p=' in value:
+                result['found'] = True
+                result['record'] = value
+                result.update(parse_dkim(value))
+                break
+    _dkim_cache.set(key, result, ttl=DKIM_CACHE_TTL if result['found'] else DKIM_NEGATIVE_TTL)
+    return result
+
+
+def discover_dkim(domain, selectors=None, stop_early=True):
+    """Probe DKIM selectors for `domain` concurrently.
+
+    Returns (found, dangling, failed): selectors with a key record, selectors
+    whose CNAME points nowhere (typical of a half-finished Microsoft 365 setup)
+    and selectors that could not be looked up.
+    At most DKIM_IN_FLIGHT probes run at once, in list order. With
+    `stop_early`, no further selectors are probed once a key is found; probes
+    already in flight are collected since they cost nothing more.
+    """
+    selectors = list(dict.fromkeys(selectors or DKIM_SELECTORS))
+    queued = iter(selectors)
+    pending = {}
+    results = []
+    while True:
+        if not (stop_early and any(r['found'] for r in results)):
+            for selector in itertools.islice(queued, DKIM_IN_FLIGHT - len(pending)):
+                pending[_dkim_pool.submit(probe_dkim_selector, domain, selector)] = selector
+        if not pending:
+            break
+        done, _ = wait(pending, return_when=FIRST_COMPLETED)
+        for future in done:
+            del pending[future]
+            results.append(future.result())
+    order = {s: i for i, s in enumerate(selectors)}
+    results.sort(key=lambda r: order[r['selector']])
+    found = [r for r in results if r['found']]
+    dangling = [r for r in results if r['cname'] and not r['found']]
+    failed = [r for r in results if r.get('error')]
+    return found, dangling, failed
+
+
+def start_queries(domain, selectors=None):
+    """Submit every DNS Analyzer query for `domain` at once; returns {section: Future}"""
+    return {
+        'A': _query_pool.submit(resolve, domain, 'A'),
+        'AAAA': _query_pool.submit(resolve, domain, 'AAAA'),
+        'MX': _query_pool.submit(resolve, domain, 'MX'),
+        'CNAME': _query_pool.submit(resolve, f"www.{domain}", 'CNAME'),
+        'TXT': _query_pool.submit(resolve, domain, 'TXT'),
+        'DMARC': _query_pool.submit(resolve, f"_dmarc.{domain}", 'TXT'),
+        'DKIM': _query_pool.submit(discover_dkim, domain, selectors),
+        'NS': _query_pool.submit(resolve, domain, 'NS'),
+        'SOA': _query_pool.submit(resolve, domain, 'SOA'),
+    }
+
+
+def _addresses(answer, rtype):
+    return [r['data'] for r in answer.get('Answer') or [] if r.get('type') == rtype]
+
+
+def resolve_addresses(host):
+    """IPv4 and IPv6 addresses of `host`"""
+    return (_addresses(resolve(host, 'A'), TYPE_A)
+            + _addresses(resolve(host, 'AAAA'), TYPE_AAAA))
+
+
+def check_rdns(ip, host=None):
+    """PTR lookup plus forward confirmation (FCrDNS) for `ip`.
+
+    The PTR names are resolved again and the IP must be among their
+    addresses. With `host`, also reports whether a PTR name equals it, which
+    receivers like to see for a mail server.
+    """
+    result = {'ip': ip, 'host': host, 'ptr': [], 'confirmed': False, 'matches_host': None, 'error': None}
+    try:
+        answer = resolve(ipaddress.ip_address(ip).reverse_pointer, 'PTR')
+        result['ptr'] = [name.rstrip('.').lower() for name in _addresses(answer, TYPE_PTR)]
+        for name in result['ptr']:
+            if ipaddress.ip_address(ip) in {ipaddress.ip_address(a) for a in resolve_addresses(name)}:
+                result['confirmed'] = True
+                break
+    except Exception as e:
+        result['error'] = str(e)
+    if host and result['ptr']:
+        result['matches_host'] = host.rstrip('.').lower() in result['ptr']
+    return result
+
+
+def check_host_rdns(host):
+    """Resolve `host` and check reverse DNS of each of its addresses concurrently"""
+    futures = [_rdns_pool.submit(check_rdns, ip, host) for ip in resolve_addresses(host)]
+    return [future.result() for future in futures]
+
+
+def start_rdns(ips=(), hosts=()):
+    """Reverse DNS checks for `ips` and for the addresses of `hosts` (e.g. MX hosts).
+
+    Returns {ip or host: Future}; a host's Future resolves to a list of results.
+    """
+    futures = {ip: _rdns_pool.submit(check_rdns, ip) for ip in dict.fromkeys(ips)}
+    futures.update({host: _query_pool.submit(check_host_rdns, host) for host in dict.fromkeys(hosts)})
+    return futures
@@ -0,0 +1,346 @@
+"""Streaming export of DNS, WHOIS, SSL and IP check results.
+
+Each check becomes one flat row with a fixed set of columns, written as soon
+as it finishes, so exporting a long domain list keeps only the checks in
+flight (and, for Parquet, one row group) in memory. CSV and JSONL need only
+the standard library; Parquet needs pyarrow.
+
+Headless use:
+
+    python export.py domains.txt --checks dns,whois,ssl --format parquet -o audit.parquet
+"""
+import argparse
+import csv
+import ipaddress
+import json
+import sys
+import threading
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from datetime import datetime
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:  # optional, only needed for Parquet
+    pa = pq = None
+
+import providers
+from dns_lookup import DKIM_SELECTORS, DOH_RESOLVERS
+from ip_lookup import IP_PROVIDERS
+from prefetch import run, summarize
+from rdap import naive_utc, registry_provider
+
+CHECKS = ('dns', 'whois', 'ssl', 'ip')
+DOMAIN_CHECKS = ('dns', 'whois', 'ssl')
+WINDOW = 32
+# Share of each provider's rate limit a bulk export may use, leaving the rest
+# to agents using the app at the same time
+EXPORT_SHARE = 0.8
+# DoH queries behind one DNS check: 8 record lookups plus the DKIM probes
+DNS_CHECK_QUERIES = 8 + len(DKIM_SELECTORS)
+PARQUET_BATCH_ROWS = 5000
+
+# (column, type) - the type only matters for Parquet
+COLUMNS = [
+    ('target', 'str'), ('check', 'str'), ('level', 'str'), ('summary', 'str'),
+    ('error', 'str'), ('checked_at', 'str'),
+    # dns
+    ('a', 'str'), ('aaaa', 'str'), ('mx', 'str'), ('ns', 'str'),
+    ('spf', 'bool'), ('dmarc', 'bool'), ('dkim_selectors', 'str'),
+    # whois
+    ('registrar', 'str'), ('expires', 'str'), ('days_left', 'int'),
+    ('status', 'str'), ('source', 'str'),
+    # ssl
+    ('tls_verified', 'bool'), ('tls_protocol', 'str'), ('cert_issuer', 'str'),
+    ('cert_expires', 'str'), ('http_status', 'int'), ('mixed_content', 'int'),
+    # ip
+    ('country', 'str'), ('city', 'str'), ('org', 'str'),
+]
+FIELDS = [name for name, _ in COLUMNS]
+
+
+def _records(value, key):
+    future = value[key]
+    if future.exception():
+        return []
+    return [r['data'] for r in future.result().get('Answer') or []]
+
+
+def _first(value):
+    return value[0] if isinstance(value, list) else value
+
+
+def _date(value):
+    return str(value).split()[0] if isinstance(value, datetime) else None
+
+
+def _dns_fields(value):
+    txt = _records(value, 'TXT')
+    dmarc = _records(value, 'DMARC')
+    dkim = value['DKIM']
+    found = [] if dkim.exception() else dkim.result()[0]
+    return {
+        'a': ' '.join(_records(value, 'A')),
+        'aaaa': ' '.join(_records(value, 'AAAA')),
+        'mx': ' '.join(_records(value, 'MX')),
+        'ns': ' '.join(_records(value, 'NS')),
+        'spf': any('v=spf1' in r for r in txt),
+        'dmarc': any('v=DMARC' in r for r in dmarc + txt),
+        'dkim_selectors': ' '.join(r['selector'] for r in found),
+    }
+
+
+def _whois_fields(w):
+    exp = naive_utc(_first(w.expiration_date))
+    return {
+        'registrar': w.registrar,
+        'expires': _date(exp),
+        'days_left': (exp - datetime.now()).days if isinstance(exp, datetime) else None,
+        'status': str(_first(w.status)).split()[0] if w.status else None,
+        'source': w.source,
+    }
+
+
+def _ssl_fields(res):
+    if res['error']:
+        return {'error': res['error']}
+    http = res['http'] or {}
+    return {
+        'tls_verified': res['verified'],
+        'tls_protocol': res['protocol'],
+        'cert_issuer': res['chain'][0]['organization'] if res['chain'] else None,
+        'cert_expires': res['cert'].get('notAfter'),
+        'http_status': http.get('status'),
+        'mixed_content': len(http['mixed_content']) if 'mixed_content' in http else None,
+    }
+
+
+def _ip_fields(geo_data):
+    return {
+        'country': geo_data.get('country_name'),
+        'city': geo_data.get('city'),
+        'org': geo_data.get('org'),
+    }
+
+
+def to_row(check, target, value):
+    """Flatten a finished check (Future, or dict of Futures for DNS) into one export row"""
+    row = dict.fromkeys(FIELDS)
+    row['target'], row['check'] = target, check
+    row['level'], row['summary'] = summarize(check, value)
+    row['checked_at'] = datetime.now().isoformat(timespec='seconds')
+    if check == 'dns':
+        row.update(_dns_fields(value))
+        errors = [f"{key}: {type(future.exception()).__name__}: {future.exception()}"
+                  for key, future in value.items() if future.exception()]
+        row['error'] = '; '.join(errors) or None
+        return row
+    error = value.exception()
+    if error:
+        row['error'] = f"{type(error).__name__}: {error}"
+    elif check == 'whois':
+        row.update(_whois_fields(value.result()))
+    elif check == 'ssl':
+        row.update(_ssl_fields(value.result()))
+    elif check == 'ip' and value.result():
+        row.update(_ip_fields(value.result()))
+    return row
+
+
+_pacers = {}
+_pacers_lock = threading.Lock()
+
+
+def _pacer(check, target):
+    """Bucket admitting `check` at the rate its providers can take, or None if unlimited"""
+    if check == 'dns':
+        key, names, cost = 'dns', list(DOH_RESOLVERS), DNS_CHECK_QUERIES
+    elif check == 'ip':
+        key, names, cost = 'ip', IP_PROVIDERS, 1
+    elif check == 'whois':
+        # Paced per registry; without RDAP the WHOIS scheduler paces the lookup
+        key = registry_provider(target)
+        if key is None:
+            return None
+        names, cost = [key], 1
+    else:
+        return None
+    with _pacers_lock:
+        if key not in _pacers:
+            limits = [providers.PROVIDERS[name].bucket for name in names]
+            rate = EXPORT_SHARE * sum(b.rate for b in limits) / cost
+            burst = max(1, int(EXPORT_SHARE * sum(b.capacity for b in limits) / cost))
+            _pacers[key] = providers.TokenBucket(rate, burst)
+        return _pacers[key]
+
+
+def _check(check, target):
+    try:
+        value = run(check, target)
+        wait(value.values() if isinstance(value, dict) else [value])
+        return to_row(check, target, value)
+    except Exception as e:
+        # One odd result must not lose the rest of a streaming export
+        row = dict.fromkeys(FIELDS)
+        row.update(target=target, check=check, level='error', summary="check failed",
+                   error=f"{type(e).__name__}: {e}", checked_at=datetime.now().isoformat(timespec='seconds'))
+        return row
+
+
+def plan(targets, checks=DOMAIN_CHECKS):
+    """(check, target) pairs for each domain or IP, generated lazily"""
+    for target in targets:
+        target = target.strip().lower()
+        if not target or target.startswith('#'):
+            continue
+        try:
+            ipaddress.ip_address(target)
+        except ValueError:
+            domain = target[4:] if target.startswith('www.') else target
+            for check in checks:
+                if check == 'ssl':
+                    yield 'ssl', domain
+                    yield 'ssl', f"www.{domain}"
+                elif check != 'ip':
+                    yield check, domain
+        else:
+            if 'ip' in checks:
+                yield 'ip', target
+
+
+def audit(targets, checks=DOMAIN_CHECKS, window=WINDOW):
+    """Run `checks` over `targets` and yield rows in completion order.
+
+    At most `window` checks are in flight, so memory stays flat however long
+    `targets` is; it can be any iterable, e.g. an open file. Checks are started
+    no faster than their providers' rate limits allow, so a long list waits
+    for capacity instead of failing once the bursts are spent.
+    """
+    jobs = plan(targets, checks)
+    with ThreadPoolExecutor(max_workers=window, thread_name_prefix="export") as pool:
+        pending = set()
+        for check, target in jobs:
+            pacer = _pacer(check, target)
+            while pacer and not pacer.acquire(timeout=0.5):
+                # Hand back finished rows while waiting for capacity
+                done, pending = wait(pending, timeout=0, return_when=FIRST_COMPLETED)
+                for future in done:
+                    yield future.result()
+            pending.add(pool.submit(_check, check, target))
+            if len(pending) >= window:
+                done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    yield future.result()
+        for future in pending:
+            yield future.result()
+
+
+class CsvExporter:
+    """Plain CSV with a header row"""
+    extension, mime, binary = 'csv', 'text/csv', False
+
+    def __init__(self, f):
+        self.writer = csv.DictWriter(f, fieldnames=FIELDS)
+        self.writer.writeheader()
+
+    def write(self, row):
+        self.writer.writerow(row)
+
+    def close(self):
+        pass
+
+
+class JsonlExporter:
+    """One JSON object per line"""
+    extension, mime, binary = 'jsonl', 'application/x-ndjson', False
+
+    def __init__(self, f):
+        self.f = f
+
+    def write(self, row):
+        self.f.write(json.dumps(row, default=str) + '\n')
+
+    def close(self):
+        pass
+
+
+class ParquetExporter:
+    """Zstandard-compressed Parquet, written one row group per PARQUET_BATCH_ROWS rows"""
+    extension, mime, binary = 'parquet', 'application/vnd.apache.parquet', True
+
+    def __init__(self, f):
+        if pa is None:
+            raise RuntimeError("Parquet export needs pyarrow (pip install pyarrow)")
+        types = {'str': pa.string(), 'int': pa.int64(), 'bool': pa.bool_()}
+        self.schema = pa.schema([(name, types[kind]) for name, kind in COLUMNS])
+        self.writer = pq.ParquetWriter(f, self.schema, compression='zstd')
+        self.batch = []
+
+    def write(self, row):
+        self.batch.append(row)
+        if len(self.batch) >= PARQUET_BATCH_ROWS:
+            self._flush()
+
+    def _flush(self):
+        if self.batch:
+            self.writer.write_table(pa.Table.from_pylist(self.batch, schema=self.schema))
+            self.batch = []
+
+    def close(self):
+        self._flush()
+        self.writer.close()
+
+
+EXPORTERS = {'csv': CsvExporter, 'jsonl': JsonlExporter, 'parquet': ParquetExporter}
+
+
+def available_formats():
+    """Formats usable in this environment"""
+    return [fmt for fmt in EXPORTERS if fmt != 'parquet' or pa is not None]
+
+
+def export(rows, path, fmt='csv', progress=None):
+    """Stream `rows` into `path`; returns the number of rows written"""
+    exporter_cls = EXPORTERS[fmt]
+    count = 0
+    f = open(path, 'wb') if exporter_cls.binary else open(path, 'w', newline='', encoding='utf-8')
+    with f:
+        exporter = exporter_cls(f)
+        for row in rows:
+            exporter.write(row)
+            count += 1
+            if progress:
+                progress(count, row)
+        exporter.close()
+    return count
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Export DNS/WHOIS/SSL/IP checks for a list of domains and IPs")
+    parser.add_argument('targets', help="file with one domain or IP per line, or - for stdin")
+    parser.add_argument('-o', '--output', required=True, help="output file")
+    parser.add_argument('-f', '--format', choices=list(EXPORTERS), help="default: from the output extension")
+    parser.add_argument('--checks', default=','.join(CHECKS), help="comma separated, from: " + ', '.join(CHECKS))
+    parser.add_argument('--window', type=int, default=WINDOW, help="checks run concurrently")
+    args = parser.parse_args(argv)
+
+    fmt = args.format or args.output.rsplit('.', 1)[-1].lower()
+    if fmt not in EXPORTERS:
+        parser.error(f"unknown format {fmt!r}; use --format")
+    checks = [c.strip() for c in args.checks.split(',') if c.strip()]
+    unknown = set(checks) - set(CHECKS)
+    if unknown:
+        parser.error(f"unknown check(s): {', '.join(sorted(unknown))}")
+
+    def progress(count, row):
+        if count % 100 == 0:
+            print(f"{count} rows written", file=sys.stderr)
+
+    source = sys.stdin if args.targets == '-' else open(args.targets)
+    with source:
+        count = export(audit(source, checks, args.window), args.output, fmt, progress)
+    print(f"{count} rows written to {args.output}", file=sys.stderr)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,166 @@
+"""Geo-IP lookups with hedged provider fallback."""
+import threading
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+import providers
+from cache import get_cache
+
+# Geo-IP providers, in preferred fallback order
+IP_PROVIDERS = ['ipapi.co', 'ip-api.com']
+IPAPI_CO_URL = "https://ipapi.co/{ip}/json/"
+IP_API_COM_URL = "http://ip-api.com/json/{ip}"
+# Seconds a lookup waits for a rate limited provider before giving up
+IP_WAIT = 5
+
+
+def query_ipapi_co(ip, timeout=5):
+    """Query ipapi.co; returns geo_data or None"""
+    response = providers.fetch('ipapi.co', IPAPI_CO_URL.format(ip=ip), timeout=timeout)
+    if response.status_code != 200:
+        return None
+    data = response.json()
+    if data.get('error'):
+        # ipapi.co reports quota exhaustion in the body with HTTP 200
+        if 'ratelimit' in str(data.get('reason', '')).lower().replace(' ', ''):
+            providers.throttle('ipapi.co', 60)
+        return None
+    return data
+
+
+def query_ip_api_com(ip, timeout=5):
+    """Query ip-api.com and normalise its answer to the ipapi.co field names"""
+    response = providers.fetch('ip-api.com', IP_API_COM_URL.format(ip=ip), timeout=timeout)
+    if response.status_code != 200:
+        return None
+    # ip-api.com tells us how many calls are left in the current minute
+    if response.headers.get('X-Rl') == '0':
+        providers.throttle('ip-api.com', float(response.headers.get('X-Ttl', 60)))
+    fallback = response.json()
+    if fallback.get('status') != 'success':
+        return None
+    return {
+        'ip': ip,
+        'city': fallback.get('city'),
+        'region': fallback.get('regionName'),
+        'country_name': fallback.get('country'),
+        'postal': fallback.get('zip'),
+        'latitude': fallback.get('lat'),
+        'longitude': fallback.get('lon'),
+        'org': fallback.get('isp'),
+        'timezone': fallback.get('timezone'),
+        'asn': fallback.get('as')
+    }
+
+
+QUERIES = {
+    'ipapi.co': query_ipapi_co,
+    'ip-api.com': query_ip_api_com,
+}
+
+
+# Hedge the primary after its observed p90 latency, within these bounds (seconds)
+HEDGE_DEFAULT_DELAY = 1.0
+HEDGE_MIN_DELAY = 0.2
+HEDGE_MAX_DELAY = 2.0
+
+# Extra requests fired by hedging are budgeted so they can't double provider usage
+HEDGE_BUDGET = providers.TokenBucket(rate=0.2, capacity=5)
+
+HEDGE_STATS = {'lookups': 0, 'hedged': 0, 'hedge_wins': 0}
+_stats_lock = threading.Lock()
+
+_pool = ThreadPoolExecutor(max_workers=8, thread_name_prefix="ip-lookup")
+
+# Geo-IP data hardly changes and the free tiers are tight, so keep it a day
+GEO_CACHE_TTL = 24 * 3600
+_geo_cache = get_cache('geoip', maxsize=4096, ttl=GEO_CACHE_TTL)
+
+
+def _count(key):
+    with _stats_lock:
+        HEDGE_STATS[key] += 1
+
+
+def hedge_delay(name):
+    """How long to wait for `name` before firing a hedged request"""
+    p90 = providers.get(name).latency_percentile(90)
+    if p90 is None:
+        return HEDGE_DEFAULT_DELAY
+    return min(HEDGE_MAX_DELAY, max(HEDGE_MIN_DELAY, p90))
+
+
+def _query(name, ip):
+    try:
+        return QUERIES[name](ip)
+    except Exception:
+        return None
+
+
+def lookup_ip(ip, hedge=True, race=False):
+    """Cached geo_data for `ip`, or None if no provider answered"""
+    geo_data = _geo_cache.get(ip)
+    if geo_data is None:
+        geo_data = query_ip(ip, hedge=hedge, race=race)
+        if geo_data:
+            _geo_cache.set(ip, geo_data)
+    return geo_data
+
+
+def query_ip(ip, hedge=True, race=False):
+    """Return normalised geo_data for `ip`, or None if no provider answered.
+
+    The best provider is queried first. With `hedge`, the next one is fired
+    if the first hasn't answered within its p90 latency; with `race`, all
+    available providers are queried at once. The first valid answer wins.
+    A failed answer always moves on to the next provider straight away.
+    """
+    _count('lookups')
+    order = providers.wait_ordered(IP_PROVIDERS, IP_WAIT)
+    if not hedge:
+        for name in order:
+            geo_data = _query(name, ip)
+            if geo_data:
+                return geo_data
+        return None
+
+    pending = {}
+    hedged = set()
+
+    def launch(is_hedge):
+        name = order.pop(0)
+        pending[_pool.submit(_query, name, ip)] = name
+        if is_hedge:
+            hedged.add(name)
+            _count('hedged')
+        return name
+
+    if order:
+        launch(False)
+    while race and order and HEDGE_BUDGET.try_acquire():
+        launch(True)
+
+    while pending:
+        newest = list(pending.values())[-1]
+        timeout = hedge_delay(newest) if order else None
+        done, _ = wait(pending, timeout=timeout, return_when=FIRST_COMPLETED)
+        if not done:
+            # Slow answer: hedge if the budget allows, otherwise keep waiting
+            if HEDGE_BUDGET.try_acquire():
+                launch(True)
+            else:
+                wait(pending, return_when=FIRST_COMPLETED)
+            continue
+        for future in done:
+            name = pending.pop(future)
+            geo_data = future.result()
+            if geo_data:
+                # Abandon the losers: queued ones are cancelled, in-flight ones
+                # finish in the background and only feed latency stats
+                for loser in pending:
+                    loser.cancel()
+                if name in hedged:
+                    _count('hedge_wins')
+                return geo_data
+        if not pending and order:
+            launch(False)
+    return None
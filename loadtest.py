@@ -0,0 +1,596 @@
+"""Load test: many support agents using one toolkit process at once.
+
+Each simulated agent is its own Streamlit session (driven with AppTest, so
+the real app.py runs end to end) and loops over a weighted mix of the DNS,
+WHOIS, SSL, IP and ticket-analysis tools with a think time between actions.
+Every upstream - DNS-over-HTTPS, RDAP, both geo-IP providers and the site
+behind the SSL check - is a local stand-in with configurable latency, so
+the run measures the toolkit, not the internet. Agents use reserved .test
+domains: TLS connections to them (SSL prefetches from ticket analysis and
+warm-ups) go to the TLS stand-in, and the port-43 WHOIS fallback, taken when
+the RDAP rate limit runs out, is pointed at 127.0.0.1 and fails there as a
+WHOIS error, so nothing goes out.
+
+Concurrency is ramped level by level. For each level the report shows
+throughput, p50/p99 latency per tool, errors, peak thread count and RSS,
+and the level where latency breaks down (p99 beyond --slo-factor times the
+first level's, or throughput no longer growing with more agents).
+
+    python loadtest.py --sessions 1,2,4,8,16,32 --duration 30 --latency 80
+    python loadtest.py --upstream rdap=400,geoip=150 --mix dns=1,ssl=1 --json load.json
+
+By default the in-process caches are disabled so every action reaches the
+upstreams (as when agents check different customers); --warm-cache keeps them.
+The providers' real rate limits apply, as in production; --lift-limits
+replaces them to measure the toolkit against the stand-ins' capacity alone.
+"""
+import argparse
+import base64
+import ipaddress
+import itertools
+import json
+import os
+import random
+import shutil
+import socket
+import ssl
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlsplit
+
+APP = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'app.py')
+
+TOOLS = ('dns', 'whois', 'ssl', 'ip', 'ticket')
+DEFAULT_MIX = 'dns=30,whois=20,ssl=20,ip=15,ticket=15'
+UPSTREAMS = ('doh', 'rdap', 'geoip', 'site')
+# Throughput must grow by at least this much when agents are added
+MIN_SCALING_GAIN = 0.10
+
+# Record type names as sent by dns_lookup, with their DoH type codes
+RECORD_TYPES = {'A': 1, 'NS': 2, 'CNAME': 5, 'SOA': 6, 'PTR': 12, 'MX': 15, 'TXT': 16, 'AAAA': 28}
+
+
+def _percentile(values, pct):
+    if not values:
+        return None
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * pct / 100))]
+
+
+def _rss_mb():
+    """Resident memory of this process in MB (peak RSS where /proc is missing)"""
+    try:
+        with open('/proc/self/status') as f:
+            for line in f:
+                if line.startswith('VmRSS:'):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    try:
+        import resource
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return peak / (1024 * 1024 if sys.platform == 'darwin' else 1024)
+    except ImportError:
+        return None
+
+
+# ---------------------------------------------------------------- stand-ins
+
+class StandIns:
+    """Local HTTP(S) servers answering like the toolkit's upstreams"""
+
+    def __init__(self, latency_ms, jitter, workdir):
+        self.latency_ms = latency_ms  # upstream -> mean delay in ms
+        self.jitter = jitter
+        self.requests = dict.fromkeys(UPSTREAMS, 0)
+        self.lock = threading.Lock()
+        self.cert_file = self.dkim_key = None
+        self.http = self._serve(ThreadingHTTPServer(('127.0.0.1', 0), _handler(self)))
+        self.https = None
+        if _make_cert(workdir, self):
+            context = ssl.SSLContext(ssl.PROTOCOL_TLS_SERVER)
+            context.load_cert_chain(self.cert_file, self.key_file)
+            self.https = self._serve(_TLSServer(('127.0.0.1', 0), _handler(self), context))
+
+    @staticmethod
+    def _serve(server):
+        server.daemon_threads = True
+        threading.Thread(target=server.serve_forever, name="standin", daemon=True).start()
+        return server
+
+    @property
+    def base_url(self):
+        return f"http://127.0.0.1:{self.http.server_address[1]}"
+
+    @property
+    def ssl_target(self):
+        return f"localhost:{self.https.server_address[1]}" if self.https else None
+
+    def delay(self, upstream):
+        with self.lock:
+            self.requests[upstream] += 1
+        mean = self.latency_ms[upstream] / 1000
+        time.sleep(max(0.0, mean * (1 + self.jitter * random.uniform(-1, 1))))
+
+    def close(self):
+        for server in (self.http, self.https):
+            if server:
+                server.shutdown()
+                server.server_close()
+
+
+class _TLSServer(ThreadingHTTPServer):
+    """HTTPS server that does the TLS handshake in the request thread"""
+
+    def __init__(self, address, handler, context):
+        self.context = context
+        super().__init__(address, handler)
+
+    def finish_request(self, request, client_address):
+        try:
+            request = self.context.wrap_socket(request, server_side=True)
+        except (ssl.SSLError, OSError):
+            return  # e.g. the session resumption probe hanging up early
+        super().finish_request(request, client_address)
+
+
+def _make_cert(workdir, standins):
+    """Self-signed cert for localhost; the DKIM stand-in reuses its public key"""
+    openssl = shutil.which('openssl')
+    if not openssl:
+        return False
+    cert, key = os.path.join(workdir, 'cert.pem'), os.path.join(workdir, 'key.pem')
+    try:
+        subprocess.run([openssl, 'req', '-x509', '-newkey', 'rsa:2048', '-nodes', '-days', '2',
+                        '-keyout', key, '-out', cert, '-subj', '/CN=localhost',
+                        '-addext', 'subjectAltName=DNS:localhost,IP:127.0.0.1'],
+                       check=True, capture_output=True)
+        der = subprocess.run([openssl, 'pkey', '-in', key, '-pubout', '-outform', 'DER'],
+                             check=True, capture_output=True).stdout
+    except (OSError, subprocess.CalledProcessError):
+        return False
+    standins.cert_file, standins.key_file = cert, key
+    standins.dkim_key = base64.b64encode(der).decode()
+    return True
+
+
+def _dns_answer(name, rtype, dkim_key):
+    """DoH JSON answer: every .test domain is a working site with mail on 127.0.0.1"""
+    name = name.rstrip('.').lower()
+    rtype = rtype.upper()
+    code = RECORD_TYPES.get(rtype, 0)
+    data = []
+    if name.endswith('.in-addr.arpa') or name.endswith('.ip6.arpa'):
+        data = ['localhost.'] if rtype == 'PTR' else []
+    elif rtype == 'A':
+        data = ['127.0.0.1']
+    elif rtype == 'MX':
+        data = [f"10 mail.{name}."]
+    elif rtype == 'NS':
+        data = [f"ns1.{name}.", f"ns2.{name}."]
+    elif rtype == 'SOA':
+        data = [f"ns1.{name}. hostmaster.{name}. 2024010101 7200 3600 1209600 300"]
+    elif rtype == 'TXT' and name.startswith('_dmarc.'):
+        data = ['"v=DMARC1; p=none"']
+    elif rtype == 'TXT' and '._domainkey.' in name:
+        if not name.startswith('default.'):
+            return {'Status': 3, 'Question': [{'name': f"{name}.", 'type': code}]}
+        data = [f'"v=DKIM1; k=rsa; p={dkim_key or ""}"']
+    elif rtype == 'TXT':
+        data = ['"v=spf1 a mx -all"']
+    return {
+        'Status': 0,
+        'Question': [{'name': f"{name}.", 'type': code}],
+        'Answer': [{'name': f"{name}.", 'type': code, 'TTL': 300, 'data': d} for d in data],
+    }
+
+
+def _rdap_domain(domain):
+    year = time.gmtime().tm_year
+    return {
+        'objectClassName': 'domain',
+        'ldhName': domain,
+        'status': ['active', 'client transfer prohibited'],
+        'events': [
+            {'eventAction': 'registration', 'eventDate': f"{year - 3}-03-01T10:00:00Z"},
+            {'eventAction': 'last changed', 'eventDate': f"{year}-01-15T10:00:00Z"},
+            {'eventAction': 'expiration', 'eventDate': f"{year + 1}-03-01T10:00:00Z"},
+        ],
+        'entities': [{'roles': ['registrar'], 'vcardArray': ['vcard', [
+            ['version', {}, 'text', '4.0'], ['fn', {}, 'text', 'Stand-in Registrar Ltd']]]}],
+        'nameservers': [{'ldhName': f"ns1.{domain}"}, {'ldhName': f"ns2.{domain}"}],
+        'secureDNS': {'delegationSigned': False},
+    }
+
+
+def _ipapi_co(ip):
+    return {'ip': ip, 'city': 'Cape Town', 'region': 'Western Cape', 'country_name': 'South Africa',
+            'country_code': 'ZA', 'postal': '8001', 'latitude': -33.92, 'longitude': 18.42,
+            'org': 'Stand-in Hosting', 'asn': 'AS64500', 'timezone': 'Africa/Johannesburg'}
+
+
+def _ip_api_com(ip):
+    return {'status': 'success', 'query': ip, 'city': 'Cape Town', 'regionName': 'Western Cape',
+            'country': 'South Africa', 'countryCode': 'ZA', 'zip': '8001', 'lat': -33.92, 'lon': 18.42,
+            'isp': 'Stand-in Hosting', 'org': 'Stand-in Hosting', 'as': 'AS64500',
+            'timezone': 'Africa/Johannesburg'}
+
+
+def _handler(standins):
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = 'HTTP/1.1'
+
+        def do_GET(self):
+            parts = urlsplit(self.path)
+            path = parts.path
+            if path.startswith('/doh'):
+                query = parse_qs(parts.query)
+                standins.delay('doh')
+                self._json(_dns_answer(query['name'][0], query.get('type', ['A'])[0], standins.dkim_key))
+            elif path.startswith('/rdap/domain/'):
+                standins.delay('rdap')
+                self._json(_rdap_domain(path.rsplit('/', 1)[1].lower()), 'application/rdap+json')
+            elif path.startswith('/ipapi/'):
+                standins.delay('geoip')
+                self._json(_ipapi_co(path.split('/')[2]))
+            elif path.startswith('/ip-api/'):
+                standins.delay('geoip')
+                self._json(_ip_api_com(path.split('/')[3]))
+            else:
+                standins.delay('site')
+                body = (b"<!doctype html><html><head><title>Stand-in site</title></head>"
+                        b"<body><h1>It works</h1></body></html>")
+                self._send(200, body, 'text/html; charset=utf-8')
+
+        def _json(self, data, content_type='application/json'):
+            self._send(200, json.dumps(data).encode(), content_type)
+
+        def _send(self, status, body, content_type):
+            self.send_response(status)
+            self.send_header('Content-Type', content_type)
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format, *args):
+            pass
+
+    return Handler
+
+
+# ------------------------------------------------------------ toolkit setup
+
+def configure(standins, workdir, lift_limits=False, warm_cache=False):
+    """Point the toolkit at the stand-ins; must run before app.py is first loaded"""
+    bootstrap = os.path.join(workdir, 'rdap-bootstrap.json')
+    with open(bootstrap, 'w') as f:
+        json.dump({'publication': time.strftime('%Y-%m-%dT%H:%M:%SZ', time.gmtime()),
+                   'services': [[['test'], [f"{standins.base_url}/rdap/"]]]}, f)
+    os.environ['RDAP_BOOTSTRAP_CACHE'] = bootstrap
+    if standins.cert_file:
+        # The toolkit verifies certificates against the stand-in's own CA
+        os.environ['SSL_CERT_FILE'] = standins.cert_file
+    if not warm_cache:
+        os.environ['CACHE_BACKEND'] = 'memory'
+    # Bare-mode and deprecation warnings would repeat for every session
+    os.environ.setdefault('STREAMLIT_LOGGER_LEVEL', 'error')
+
+    import cache
+    import dns_lookup
+    import ip_lookup
+    import providers
+    import rdap  # noqa: F401 - reads RDAP_BOOTSTRAP_CACHE on import
+    import ssl_inspect  # noqa: F401 - registers the ssl cache
+    import whois_scheduler
+
+    dns_lookup.DOH_RESOLVERS.update({
+        'dns.google': f"{standins.base_url}/doh/google",
+        'cloudflare-dns.com': f"{standins.base_url}/doh/cloudflare",
+    })
+    ip_lookup.IPAPI_CO_URL = f"{standins.base_url}/ipapi/{{ip}}/json/"
+    ip_lookup.IP_API_COM_URL = f"{standins.base_url}/ip-api/json/{{ip}}"
+
+    # .test never resolves: TLS to it goes to the TLS stand-in, and port-43
+    # WHOIS to a local address where nothing listens
+    tls_address = (standins.https or standins.http).server_address
+    create_connection = socket.create_connection
+
+    def connect(address, *args, **kwargs):
+        if str(address[0]).lower().rstrip('.').endswith('.test'):
+            address = tls_address
+        return create_connection(address, *args, **kwargs)
+    socket.create_connection = connect
+    whois_scheduler._tld_servers['test'] = '127.0.0.1'
+
+    if lift_limits:
+        # Only the stand-ins' capacity counts, not the providers' quotas
+        providers.register('rdap:127.0.0.1', rate=2, burst=10)
+        for provider in providers.PROVIDERS.values():
+            provider.bucket = providers.TokenBucket(1e6, 1e6)
+    if not warm_cache:
+        for c in cache.CACHES.values():
+            c.maxsize = 0
+
+
+# --------------------------------------------------------------- sessions
+
+class Recorder:
+    """Action latencies and resource samples for one concurrency level"""
+
+    def __init__(self):
+        self.actions = []  # (tool, seconds, ok)
+        self.peak_threads = threading.active_count()
+        self.peak_rss = _rss_mb()
+        self.lock = threading.Lock()
+
+    def add(self, tool, seconds, ok):
+        with self.lock:
+            self.actions.append((tool, seconds, ok))
+
+    def sample(self):
+        threads, rss = threading.active_count(), _rss_mb()
+        with self.lock:
+            self.peak_threads = max(self.peak_threads, threads)
+            if rss is not None:
+                self.peak_rss = max(self.peak_rss or 0, rss)
+
+
+def _random_ip(rng):
+    while True:
+        ip = ipaddress.IPv4Address(rng.getrandbits(32))
+        if ip.is_global:
+            return str(ip)
+
+
+def _button(at, label):
+    return next(b for b in at.button if b.label == label)
+
+
+def _act(at, tool, domain, ip, ssl_target):
+    """Fill in the tool's form and click its button; the next run() is the timed part"""
+    if tool == 'dns':
+        at.text_input(key='dns_domain').input(domain)
+        at.checkbox(key='dns_smtp_probe').uncheck()
+        _button(at, "🔍 Analyze DNS Records").click()
+    elif tool == 'whois':
+        at.text_input(key='whois_domain').input(domain)
+        _button(at, "🔍 Check WHOIS").click()
+    elif tool == 'ssl':
+        at.text_input(key='ssl_domain').input(ssl_target)
+        at.checkbox(key='ssl_check_www').uncheck()
+        _button(at, "🔍 Check SSL Certificate").click()
+    elif tool == 'ip':
+        at.text_input(key='ip_input').input(ip)
+        _button(at, "🔍 Lookup IP").click()
+    else:
+        at.text_area(key='ticket_input').input(
+            f"Hi, since this morning {domain} shows an error and mail to info@{domain} bounces. "
+            f"The server IP is {ip}. Can you check what is wrong? Thanks")
+        at.button(key='analyze_btn').click()
+
+
+def _share_server_state():
+    """Make concurrent AppTests share what sessions of one Streamlit server share.
+
+    AppTest compiles app.py and installs a global Runtime on every run, then
+    clears it; concurrent sessions would recompile the script each time and
+    pull the Runtime from under each other.
+    """
+    from streamlit.runtime import Runtime
+    from streamlit.testing.v1 import app_test, local_script_runner
+
+    script_cache = app_test.ScriptCache()
+    script_cache.get_bytecode(APP)
+    app_test.ScriptCache = local_script_runner.ScriptCache = lambda: script_cache
+    last = {}
+
+    def instance(cls):
+        if cls._instance is not None:
+            last['runtime'] = cls._instance
+        if 'runtime' not in last:
+            raise RuntimeError("Runtime hasn't been created!")
+        return last['runtime']
+
+    Runtime.instance = classmethod(instance)
+    Runtime.exists = classmethod(lambda cls: cls._instance is not None or 'runtime' in last)
+
+
+def run_session(agent, window, ready, mix, ssl_target, think, timeout, recorder, counter):
+    """One agent: load the app, wait for the others, then run weighted tool
+    actions until window['until']"""
+    from streamlit.testing.v1 import AppTest
+
+    rng = random.Random(agent)
+    tools, weights = zip(*mix.items())
+    at = AppTest.from_file(APP, default_timeout=timeout)
+    try:
+        at.run()
+    finally:
+        ready.wait()
+    page = 'DNS'
+    while time.monotonic() < window['until']:
+        tool = rng.choices(tools, weights)[0]
+        n = next(counter)
+        domain, ip = f"agent{agent}-{n}.test", _random_ip(rng)
+        ok = True
+        start = time.monotonic()
+        try:
+            wanted = {'dns': 'DNS', 'whois': 'WHOIS', 'ssl': 'SSL', 'ip': 'IP'}.get(tool, page)
+            if wanted != page:
+                # Switching tools is a click of its own, not part of the action
+                at.session_state.tool = page = wanted
+                at.run()
+            _act(at, tool, domain, ip, ssl_target)
+            start = time.monotonic()
+            at.run()
+            ok = not at.exception
+        except Exception:
+            ok = False  # includes AppTest's script timeout
+        recorder.add(tool, time.monotonic() - start, ok)
+        if think:
+            time.sleep(min(rng.expovariate(1 / think), max(0.0, window['until'] - time.monotonic())))
+
+
+def run_level(sessions, duration, mix, ssl_target, think, timeout, counter):
+    """Run `sessions` agents for `duration` seconds once all have loaded the app"""
+    recorder = Recorder()
+    window = {}
+
+    def open_window():
+        window['start'] = time.monotonic()
+        window['until'] = window['start'] + duration
+
+    ready = threading.Barrier(sessions, action=open_window)
+    threads = [threading.Thread(target=run_session, name=f"agent-{i}",
+                                args=(i, window, ready, mix, ssl_target, think, timeout, recorder, counter),
+                                daemon=True)
+               for i in range(sessions)]
+    for t in threads:
+        t.start()
+    while any(t.is_alive() for t in threads):
+        recorder.sample()
+        time.sleep(0.25)
+    return recorder, time.monotonic() - window['start']
+
+
+def summarize(sessions, recorder, elapsed):
+    """Per-level figures; latencies in ms"""
+    def stats(actions):
+        latencies = [s * 1000 for _, s, _ in actions]
+        return {
+            'actions': len(actions),
+            'errors': sum(1 for _, _, ok in actions if not ok),
+            'p50_ms': round(_percentile(latencies, 50), 1) if latencies else None,
+            'p99_ms': round(_percentile(latencies, 99), 1) if latencies else None,
+        }
+
+    level = {'sessions': sessions, 'elapsed_s': round(elapsed, 1),
+             'throughput': round(len(recorder.actions) / elapsed, 2) if elapsed else 0.0}
+    level.update(stats(recorder.actions))
+    level['tools'] = {tool: stats([a for a in recorder.actions if a[0] == tool])
+                      for tool in TOOLS if any(a[0] == tool for a in recorder.actions)}
+    level['peak_threads'] = recorder.peak_threads
+    level['peak_rss_mb'] = round(recorder.peak_rss, 1) if recorder.peak_rss is not None else None
+    return level
+
+
+def breakdown(levels, slo_factor):
+    """First level whose p99 passes the SLO or that adds agents without adding throughput"""
+    if not levels or levels[0]['p99_ms'] is None:
+        return None
+    baseline = levels[0]['p99_ms']
+    for previous, level in zip(levels, levels[1:]):
+        if level['p99_ms'] is not None and level['p99_ms'] > slo_factor * baseline:
+            return {'sessions': level['sessions'],
+                    'reason': f"p99 {level['p99_ms']:.0f} ms is over {slo_factor:g}x the "
+                              f"{levels[0]['sessions']}-session p99 ({baseline:.0f} ms)"}
+        if level['throughput'] < previous['throughput'] * (1 + MIN_SCALING_GAIN):
+            return {'sessions': level['sessions'],
+                    'reason': f"throughput {level['throughput']:.1f}/s grew less than "
+                              f"{MIN_SCALING_GAIN:.0%} over {previous['sessions']} sessions "
+                              f"({previous['throughput']:.1f}/s)"}
+    return None
+
+
+def _fmt(value, spec=".0f"):
+    return "-" if value is None else format(value, spec)
+
+
+def report(levels, broke, standins, lift_limits=False, out=sys.stdout):
+    limits = "lifted (stand-in capacity only)" if lift_limits else "real, as in production"
+    print(f"\nProvider rate limits: {limits}", file=out)
+    print(f"{'sessions':>8} {'actions':>8} {'act/s':>7} {'p50 ms':>8} {'p99 ms':>8} "
+          f"{'errors':>7} {'threads':>8} {'rss MB':>7}", file=out)
+    for lv in levels:
+        print(f"{lv['sessions']:>8} {lv['actions']:>8} {lv['throughput']:>7.2f} {_fmt(lv['p50_ms']):>8} "
+              f"{_fmt(lv['p99_ms']):>8} {lv['errors']:>7} {lv['peak_threads']:>8} "
+              f"{_fmt(lv['peak_rss_mb']):>7}", file=out)
+    print("\nPer tool, p50 / p99 ms (errors):", file=out)
+    print(f"{'sessions':>8} " + ' '.join(f"{tool:>22}" for tool in TOOLS), file=out)
+    for lv in levels:
+        cells = []
+        for tool in TOOLS:
+            t = lv['tools'].get(tool)
+            cells.append(f"{_fmt(t['p50_ms'])} / {_fmt(t['p99_ms'])} ({t['errors']})" if t else "-")
+        print(f"{lv['sessions']:>8} " + ' '.join(f"{c:>22}" for c in cells), file=out)
+    print("\nUpstream requests: " + ', '.join(f"{k} {v}" for k, v in standins.requests.items()), file=out)
+    if broke:
+        print(f"Latency breaks down at {broke['sessions']} sessions: {broke['reason']}", file=out)
+    elif levels:
+        print(f"No breakdown up to {levels[-1]['sessions']} sessions", file=out)
+
+
+def _pairs(text, cast=float):
+    pairs = {}
+    for item in filter(None, (p.strip() for p in text.split(','))):
+        name, _, value = item.partition('=')
+        pairs[name.strip()] = cast(value)
+    return pairs
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Simulate concurrent agents against local stand-in upstreams")
+    parser.add_argument('--sessions', default='1,2,4,8,16', help="concurrency levels to ramp through")
+    parser.add_argument('--duration', type=float, default=20, help="seconds per level")
+    parser.add_argument('--think', type=float, default=1.0, help="mean think time between actions (s)")
+    parser.add_argument('--mix', default=DEFAULT_MIX, help="tool weights, from: " + ', '.join(TOOLS))
+    parser.add_argument('--latency', type=float, default=50, help="mean upstream latency (ms)")
+    parser.add_argument('--upstream', default='', help="per-upstream latency, e.g. rdap=400,geoip=150; "
+                                                       "upstreams: " + ', '.join(UPSTREAMS))
+    parser.add_argument('--jitter', type=float, default=0.5, help="latency varies by +/- this fraction")
+    parser.add_argument('--timeout', type=float, default=60, help="per-action timeout (s)")
+    parser.add_argument('--slo-factor', type=float, default=3, help="p99 growth that counts as breakdown")
+    parser.add_argument('--lift-limits', action='store_true',
+                        help="replace the providers' rate limits, to find the toolkit's own ceiling")
+    parser.add_argument('--warm-cache', action='store_true', help="keep lookup caches enabled")
+    parser.add_argument('--json', help="also write the results to this file")
+    args = parser.parse_args(argv)
+
+    try:
+        levels = sorted({int(s) for s in args.sessions.split(',') if s.strip()})
+        mix = _pairs(args.mix)
+        latency = dict.fromkeys(UPSTREAMS, args.latency)
+        latency.update(_pairs(args.upstream))
+    except ValueError as e:
+        parser.error(str(e))
+    unknown = (set(mix) - set(TOOLS)) | (set(latency) - set(UPSTREAMS))
+    if unknown:
+        parser.error(f"unknown tool(s) or upstream(s): {', '.join(sorted(unknown))}")
+    if not levels or min(levels) < 1:
+        parser.error("--sessions needs positive integers")
+
+    workdir = tempfile.mkdtemp(prefix='toolkit-loadtest-')
+    standins = StandIns(latency, args.jitter, workdir)
+    try:
+        if not standins.https and mix.pop('ssl', None):
+            print("openssl not found: no TLS stand-in, SSL checks left out of the mix", file=sys.stderr)
+        mix = {tool: weight for tool, weight in mix.items() if weight > 0}
+        if not mix:
+            parser.error("--mix has no tools left")
+        configure(standins, workdir, args.lift_limits, args.warm_cache)
+        _share_server_state()
+
+        counter = itertools.count()
+        results = []
+        for sessions in levels:
+            print(f"{sessions} sessions for {args.duration:g}s...", file=sys.stderr)
+            recorder, elapsed = run_level(sessions, args.duration, mix, standins.ssl_target,
+                                          args.think, args.timeout, counter)
+            results.append(summarize(sessions, recorder, elapsed))
+        broke = breakdown(results, args.slo_factor)
+        report(results, broke, standins, args.lift_limits)
+        if args.json:
+            with open(args.json, 'w') as f:
+                json.dump({'config': vars(args), 'latency_ms': latency, 'mix': mix, 'levels': results,
+                           'breakdown': broke, 'upstream_requests': standins.requests}, f, indent=2)
+    finally:
+        standins.close()
+        shutil.rmtree(workdir, ignore_errors=True)
+
+
+if __name__ == '__main__':
+    main()
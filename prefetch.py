@@ -0,0 +1,461 @@
+"""Background checks started ahead of the agent opening a tool.
+
+Ticket analysis pulls every domain, email domain and IP out of the pasted
+thread and starts the matching DNS, WHOIS, SSL and IP checks here. When a
+tool finishes a domain, the other domain tools are warmed up for it at low
+priority. Each tool then calls ``run`` for its target: a prefetched check
+is handed over (finished or still in flight) instead of being started
+again. A prefetched result is handed over once; running the tool again
+does a fresh check.
+"""
+import ipaddress
+import itertools
+import queue
+import re
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor, wait
+from datetime import datetime
+
+import providers
+from cache import TTLCache
+from dns_lookup import start_queries
+from ip_lookup import lookup_ip
+from rdap import DomainNotFound, known_tlds, lookup_registration, naive_utc, registrable_domain
+from ssl_inspect import inspect_host
+
+PREFETCH_TTL = 300
+MAX_DOMAINS = 5
+MAX_IPS = 3
+# SSL targets: each domain and its www., then other hosts the thread names
+MAX_HOSTS = 12
+
+# Background priorities: ticket prefetches before speculative warm-ups
+HIGH = 0
+LOW = 1
+
+# Warm-ups are skipped when this many checks are already queued or running,
+# are rate limited, and are cancelled if still queued after WARM_TTL seconds
+WARM_MAX_LOAD = 12
+WARM_TTL = 120
+WARM_BUDGET = providers.TokenBucket(rate=0.5, capacity=6)
+DOMAIN_CHECKS = ('dns', 'whois', 'ssl')
+DNS_SECTIONS = ('A', 'AAAA', 'MX', 'CNAME', 'TXT', 'DMARC', 'DKIM', 'NS', 'SOA')
+
+# Domains that show up in every ticket and are never what the client means
+IGNORED_DOMAINS = ('hostafrica.com', 'host-ww.net', 'hostafrica.co.za', 'google.com', 'gmail.com')
+
+# "Domains" that are really file names in pasted logs and URLs
+FILE_SUFFIXES = {
+    'php', 'html', 'htm', 'js', 'css', 'png', 'jpg', 'jpeg', 'gif', 'svg', 'txt',
+    'log', 'zip', 'gz', 'tar', 'pdf', 'doc', 'docx', 'xls', 'xlsx', 'json', 'xml',
+    'ini', 'conf', 'sql', 'py', 'sh', 'exe', 'bak', 'htaccess', 'md', 'csv',
+}
+
+DOMAIN_RE = re.compile(r'\b((?:[a-z0-9](?:[a-z0-9-]{0,61}[a-z0-9])?\.)+(?:[a-z]{2,24}|xn--[a-z0-9-]{2,59}))\b', re.IGNORECASE)
+EMAIL_RE = re.compile(r'\b[\w.+-]+@((?:[a-z0-9-]+\.)+[a-z]{2,63})\b', re.IGNORECASE)
+IPV4_RE = re.compile(r'\b(?:\d{1,3}\.){3}\d{1,3}\b')
+
+
+class _PriorityPool:
+    """Bounded worker pool that always runs the lowest priority number first"""
+
+    def __init__(self, workers, name):
+        self.queue = queue.PriorityQueue()
+        self.order = itertools.count()
+        self.lock = threading.Lock()
+        self.active = 0
+        for i in range(workers):
+            threading.Thread(target=self._work, name=f"{name}-{i}", daemon=True).start()
+
+    def submit(self, priority, fn, *args):
+        future = Future()
+        self.queue.put((priority, next(self.order), future, fn, args))
+        return future
+
+    def load(self):
+        """Checks queued or running"""
+        with self.lock:
+            return self.queue.qsize() + self.active
+
+    def _work(self):
+        while True:
+            _, _, future, fn, args = self.queue.get()
+            # Skips warm-ups cancelled while they were queued
+            if not future.set_running_or_notify_cancel():
+                continue
+            with self.lock:
+                self.active += 1
+            try:
+                future.set_result(fn(*args))
+            except Exception as e:
+                future.set_exception(e)
+            finally:
+                with self.lock:
+                    self.active -= 1
+
+
+_pool = _PriorityPool(workers=8, name="prefetch")
+_foreground = ThreadPoolExecutor(max_workers=16, thread_name_prefix="check")
+_foreground_running = {'count': 0}
+_store = TTLCache(maxsize=256, ttl=PREFETCH_TTL)
+_store_lock = threading.Lock()
+_warm_pending = {}  # owner -> (domain, [(key, value, started_at)])
+_warm_lock = threading.Lock()
+WARM_STATS = {'started': 0, 'used': 0, 'cancelled': 0, 'skipped': 0}
+
+
+def _is_ignored(domain):
+    return any(domain == d or domain.endswith('.' + d) for d in IGNORED_DOMAINS)
+
+
+def _plausible_tld(label, tlds):
+    # Sentences run together ("is down.Please") end in a capitalised word
+    if label[0].isupper() and label[1:].islower():
+        return False
+    label = label.lower()
+    if label in FILE_SUFFIXES:
+        return False
+    # The RDAP bootstrap lists gTLDs but few ccTLDs, so two letters always pass
+    return not tlds or len(label) == 2 or label.startswith('xn--') or label in tlds
+
+
+def extract_targets(text):
+    """Domains (web and email) and public IPs mentioned in a ticket thread.
+
+    'domains' are registrable domains, for DNS and WHOIS: hosts such as
+    shop.example.co.za or mail.example.co.za count as example.co.za. 'hosts'
+    are the web hosts to check SSL on.
+    """
+    names = []
+    web_hosts = []
+    for match in EMAIL_RE.finditer(text):
+        names.append(match.group(1).lower())
+    tlds = known_tlds()
+    for match in DOMAIN_RE.finditer(text):
+        # The local part of an email address ("john.doe@...") is not a domain
+        if text[match.end():match.end() + 1] == '@':
+            continue
+        host = match.group(1).rstrip('.')
+        if not _plausible_tld(host.rsplit('.', 1)[-1], tlds):
+            continue
+        host = host.lower()
+        host = host[4:] if host.startswith('www.') else host
+        names.append(host)
+        # A mail domain ("info@mail.example.com") is not a website
+        if text[match.start() - 1:match.start()] != '@':
+            web_hosts.append(host)
+    domains = [d for d in dict.fromkeys(registrable_domain(n) for n in names) if not _is_ignored(d)]
+    domains = domains[:MAX_DOMAINS]
+    hosts = [h for d in domains for h in (d, f"www.{d}")]
+    hosts += [h for h in web_hosts if any(h.endswith('.' + d) for d in domains)]
+
+    ips = []
+    for match in IPV4_RE.finditer(text):
+        try:
+            ip = ipaddress.ip_address(match.group(0))
+        except ValueError:
+            continue
+        if ip.is_global:
+            ips.append(str(ip))
+    return {'domains': domains, 'hosts': list(dict.fromkeys(hosts))[:MAX_HOSTS],
+            'ips': list(dict.fromkeys(ips))[:MAX_IPS]}
+
+
+def _chain(source, target):
+    """Copy the outcome of one future into another"""
+    def copy(done):
+        if done.exception():
+            target.set_exception(done.exception())
+        else:
+            target.set_result(done.result())
+    source.add_done_callback(copy)
+
+
+def _start_dns_later(domain, placeholders):
+    for key, future in start_queries(domain).items():
+        _chain(future, placeholders[key])
+
+
+def _settle_placeholders(gate, placeholders):
+    """Propagate a cancelled or failed DNS gate to the per-section futures"""
+    for future in placeholders.values():
+        if gate.cancelled():
+            future.cancel()
+        elif gate.exception():
+            future.set_exception(gate.exception())
+
+
+def _start_background(check, target, priority):
+    if check == 'dns':
+        # The DNS queries fan out on their own pool once the pool reaches them;
+        # per-section futures exist up front so tools can render them progressively
+        placeholders = {key: Future() for key in DNS_SECTIONS}
+        gate = _pool.submit(priority, _start_dns_later, target, placeholders)
+        gate.add_done_callback(lambda g: _settle_placeholders(g, placeholders))
+        return dict(placeholders, _gate=gate)
+    fn = {'whois': lookup_registration, 'ssl': inspect_host, 'ip': lookup_ip}[check]
+    return _pool.submit(priority, fn, target)
+
+
+def _start_foreground(check, target, refresh=False):
+    if check == 'dns':
+        return start_queries(target)
+    fn = {'whois': lookup_registration, 'ssl': inspect_host, 'ip': lookup_ip}[check]
+    with _warm_lock:
+        _foreground_running['count'] += 1
+    # Only the WHOIS and SSL lookups take `refresh`
+    if refresh and check in ('whois', 'ssl'):
+        future = _foreground.submit(fn, target, refresh=True)
+    else:
+        future = _foreground.submit(fn, target)
+
+    def finished(_):
+        with _warm_lock:
+            _foreground_running['count'] -= 1
+    future.add_done_callback(finished)
+    return future
+
+
+def _cancel(key, value):
+    """Cancel a warm-up that hasn't started yet and forget it"""
+    gate = value.get('_gate') if isinstance(value, dict) else value
+    if gate is None or not gate.cancel():
+        return
+    WARM_STATS['cancelled'] += 1
+    with _store_lock:
+        if _store.get(key) is value:
+            _store.pop(key)
+
+
+def prefetch(check, target, priority=HIGH):
+    """Start `check` for `target` in the background unless it is already prefetched"""
+    key = (check, target)
+    with _store_lock:
+        existing = _store.get(key)
+        if existing is not None:
+            return existing
+        started = _start_background(check, target, priority)
+        _store.set(key, started)
+        return started
+
+
+def take(check, target):
+    """Hand over a prefetched check (Future, or dict of Futures for DNS), or None.
+
+    A check still queued in the prefetch pool is cancelled and None returned:
+    the agent is waiting for it now, so it must not sit behind other sessions'
+    prefetches.
+    """
+    key = (check, target)
+    with _store_lock:
+        value = _store.pop(key)
+    if value is None:
+        return None
+    gate = value.get('_gate') if isinstance(value, dict) else value
+    claimed = _claim_warm(key)
+    if gate is not None and gate.cancel():
+        return None
+    if isinstance(value, dict):
+        value = {k: f for k, f in value.items() if k != '_gate'}
+    if claimed:
+        WARM_STATS['used'] += 1
+    return value
+
+
+def run(check, target, refresh=False):
+    """The prefetched check for `target` if it has started, otherwise a foreground run.
+
+    `refresh` (WHOIS and SSL) drops any prefetch, which may hold a cached
+    answer, and re-queries the upstream.
+    """
+    if not refresh:
+        return take(check, target) or _start_foreground(check, target)
+    with _store_lock:
+        value = _store.pop((check, target))
+    if value is not None:
+        _claim_warm((check, target))
+        gate = value.get('_gate') if isinstance(value, dict) else value
+        if gate is not None:
+            gate.cancel()
+    return _start_foreground(check, target, refresh=True)
+
+
+def _claim_warm(key):
+    """Stop tracking a warm-up once a tool has taken it, so it is never cancelled"""
+    claimed = False
+    with _warm_lock:
+        for owner, (domain, entries) in list(_warm_pending.items()):
+            kept = [entry for entry in entries if entry[0] != key]
+            claimed = claimed or len(kept) < len(entries)
+            _warm_pending[owner] = (domain, kept)
+    return claimed
+
+
+def _domain_keys(domain, exclude):
+    keys = []
+    for check in DOMAIN_CHECKS:
+        if check == exclude:
+            continue
+        if check == 'ssl':
+            keys += [('ssl', domain), ('ssl', f"www.{domain}")]
+        else:
+            keys.append((check, domain))
+    return keys
+
+
+def _sweep():
+    """Cancel warm-ups that are still queued after WARM_TTL seconds"""
+    now = time.monotonic()
+    with _warm_lock:
+        for owner, (domain, entries) in list(_warm_pending.items()):
+            fresh = []
+            for key, value, started_at in entries:
+                if now - started_at > WARM_TTL:
+                    _cancel(key, value)
+                else:
+                    fresh.append((key, value, started_at))
+            if fresh:
+                _warm_pending[owner] = (domain, fresh)
+            else:
+                del _warm_pending[owner]
+
+
+def warm(domain, exclude, owner):
+    """Speculatively start the other domain checks for `domain` at low priority.
+
+    `owner` identifies the agent session: when it moves on to another domain,
+    its warm-ups for the previous one that haven't started are cancelled.
+    Returns the number of checks started.
+    """
+    domain = domain[4:] if domain.startswith('www.') else domain
+    if '.' not in domain:
+        return 0  # e.g. localhost: nothing to look up in DNS or WHOIS
+    _sweep()
+    with _warm_lock:
+        previous = _warm_pending.pop(owner, None)
+    if previous and previous[0] != domain:
+        for key, value, _ in previous[1]:
+            _cancel(key, value)
+    elif previous:
+        with _warm_lock:
+            _warm_pending[owner] = previous
+
+    started = []
+    for key in _domain_keys(domain, exclude):
+        with _store_lock:
+            if _store.get(key) is not None:
+                continue
+        with _warm_lock:
+            busy = _pool.load() + _foreground_running['count'] >= WARM_MAX_LOAD
+        if busy or not WARM_BUDGET.try_acquire():
+            WARM_STATS['skipped'] += 1
+            continue
+        started.append((key, prefetch(*key, priority=LOW), time.monotonic()))
+    if started:
+        WARM_STATS['started'] += len(started)
+        with _warm_lock:
+            domain_entries = _warm_pending.get(owner, (domain, []))[1]
+            _warm_pending[owner] = (domain, domain_entries + started)
+    return len(started)
+
+
+def start_diagnosis(text):
+    """Prefetch every relevant check for the targets found in a ticket"""
+    targets = extract_targets(text)
+    checks = []
+    for domain in targets['domains']:
+        checks.append(('dns', domain, prefetch('dns', domain)))
+        checks.append(('whois', domain, prefetch('whois', domain)))
+    for host in targets['hosts']:
+        checks.append(('ssl', host, prefetch('ssl', host)))
+    for ip in targets['ips']:
+        checks.append(('ip', ip, prefetch('ip', ip)))
+    return {'targets': targets, 'checks': checks}
+
+
+def wait_diagnosis(diagnosis, timeout):
+    """Block until every prefetched check has finished or `timeout` passes"""
+    futures = []
+    for _, _, value in diagnosis['checks']:
+        futures.extend(value.values() if isinstance(value, dict) else [value])
+    wait(futures, timeout=timeout)
+
+
+def is_done(value):
+    if isinstance(value, dict):
+        return all(f.done() for f in value.values())
+    return value.done()
+
+
+def _answers(futures, key):
+    future = futures[key]
+    if not future.done() or future.exception():
+        return None
+    return future.result().get('Answer') or []
+
+
+def summarize(check, value):
+    """One-line (level, text) summary of a finished check; level is ok/warn/error/pending"""
+    # Shown on every rerun of the sidebar and in export rows: an odd result must not break either
+    try:
+        return _summarize(check, value)
+    except Exception as e:
+        return 'error', f"could not summarise the result ({type(e).__name__})"
+
+
+def _summarize(check, value):
+    if not is_done(value):
+        return 'pending', "running..."
+
+    if check == 'dns':
+        a, mx = _answers(value, 'A'), _answers(value, 'MX')
+        txt, dmarc = _answers(value, 'TXT'), _answers(value, 'DMARC')
+        if a is None and mx is None:
+            return 'error', "DNS lookup failed"
+        spf = any('v=spf1' in r['data'] for r in txt or [])
+        has_dmarc = bool(dmarc) or any('v=DMARC' in r['data'] for r in txt or [])
+        parts = [
+            f"A {', '.join(r['data'] for r in a[:2])}" if a else "no A record",
+            f"MX {len(mx)}" if mx else "no MX",
+            "SPF ✅" if spf else "SPF ❌",
+            "DMARC ✅" if has_dmarc else "DMARC ❌",
+        ]
+        level = 'error' if not a or not mx else ('warn' if not (spf and has_dmarc) else 'ok')
+        return level, " · ".join(parts)
+
+    error = value.exception()
+    if check == 'whois':
+        if isinstance(error, DomainNotFound):
+            return 'error', "not registered"
+        if error:
+            return 'error', f"lookup failed ({type(error).__name__})"
+        w = value.result()
+        exp = naive_utc(w.expiration_date[0] if isinstance(w.expiration_date, list) else w.expiration_date)
+        text = w.registrar or "unknown registrar"
+        if isinstance(exp, datetime):
+            days_left = (exp - datetime.now()).days
+            text += f" · expires in {days_left} days"
+            return ('error' if days_left < 30 else 'warn' if days_left < 90 else 'ok'), text
+        return 'ok', text
+
+    if check == 'ssl':
+        res = None if error else value.result()
+        if res is None or res['error']:
+            return 'error', (res['error'] if res else str(error))[:80]
+        if not res['verified']:
+            return 'error', f"untrusted: {res['verify_error']}"
+        try:
+            expiry = datetime.strptime(res['cert'].get('notAfter'), '%b %d %H:%M:%S %Y %Z')
+            days_left = (expiry - datetime.now()).days
+        except (TypeError, ValueError):
+            return 'ok', f"valid ({res['protocol']})"
+        return ('warn' if days_left <= 30 else 'ok'), f"valid, {days_left} days left ({res['protocol']})"
+
+    if check == 'ip':
+        geo_data = None if error else value.result()
+        if not geo_data:
+            return 'warn', "no geolocation data"
+        return 'ok', f"{geo_data.get('city', 'N/A')}, {geo_data.get('country_name', 'N/A')} · {geo_data.get('org', 'N/A')}"
+
+    return 'ok', "done"
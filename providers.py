@@ -0,0 +1,393 @@
+"""Rate limiting and circuit breaking for the external lookup providers.
+
+Every upstream the toolkit depends on (geo-IP APIs, DNS-over-HTTPS resolvers,
+WHOIS servers) is registered here with its own token bucket and circuit
+breaker. Lookups go through ``call``/``fetch`` so that throttled or failing
+providers are skipped straight away instead of costing a full timeout, and
+``ordered`` ranks fallbacks by the latency and error rate seen so far.
+
+State lives at module level, so it is shared by every Streamlit session
+served by the same process.
+"""
+import threading
+import time
+from collections import deque
+
+import requests
+from requests.adapters import HTTPAdapter
+
+# Circuit breaker states
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half-open"
+
+# Pooled HTTP session shared by all HTTP providers
+SESSION = requests.Session()
+SESSION.mount("https://", HTTPAdapter(pool_connections=16, pool_maxsize=32))
+SESSION.mount("http://", HTTPAdapter(pool_connections=16, pool_maxsize=32))
+
+
+class ProviderUnavailable(Exception):
+    """Raised when a provider is throttled or its circuit is open"""
+
+
+class ProviderError(Exception):
+    """Raised when a provider answers with a throttling or server error"""
+
+
+class TokenBucket:
+    """Token bucket allowing `rate` calls per second with bursts of `capacity`"""
+
+    def __init__(self, rate, capacity):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = float(capacity)
+        self.updated = time.monotonic()
+        self.blocked_until = 0.0
+        self.lock = threading.Lock()
+
+    def _refill(self, now):
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def try_acquire(self):
+        """Take one token if available, without waiting"""
+        with self.lock:
+            now = time.monotonic()
+            self._refill(now)
+            if now < self.blocked_until or self.tokens < 1:
+                return False
+            self.tokens -= 1
+            return True
+
+    def acquire(self, timeout=None):
+        """Take one token, waiting up to `timeout` seconds (forever if None); False on timeout"""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while not self.try_acquire():
+            wait = self.retry_in()
+            if deadline is not None:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    return False
+                wait = min(wait, remaining)
+            time.sleep(max(wait, 0.005))
+        return True
+
+    def throttle(self, seconds):
+        """Empty the bucket and refuse calls for `seconds` (e.g. after a 429)"""
+        with self.lock:
+            now = time.monotonic()
+            self.tokens = 0.0
+            self.updated = now
+            self.blocked_until = max(self.blocked_until, now + seconds)
+
+    def available(self):
+        with self.lock:
+            now = time.monotonic()
+            self._refill(now)
+            return now >= self.blocked_until and self.tokens >= 1
+
+    def level(self):
+        """Tokens currently in the bucket"""
+        with self.lock:
+            self._refill(time.monotonic())
+            return self.tokens
+
+    def retry_in(self):
+        """Seconds until the next call would be allowed"""
+        with self.lock:
+            now = time.monotonic()
+            self._refill(now)
+            wait = max(0.0, self.blocked_until - now)
+            if self.tokens < 1:
+                wait = max(wait, (1 - self.tokens) / self.rate)
+            return wait
+
+
+class CircuitBreaker:
+    """Opens after repeated failures, then lets a single trial call through"""
+
+    def __init__(self, failure_threshold=3, error_rate=0.5, min_calls=5,
+                 cooldown=30.0, max_cooldown=300.0):
+        self.failure_threshold = failure_threshold
+        self.error_rate = error_rate
+        self.min_calls = min_calls
+        self.base_cooldown = cooldown
+        self.cooldown = cooldown
+        self.max_cooldown = max_cooldown
+        self.state = CLOSED
+        self.consecutive_failures = 0
+        self.opened_at = 0.0
+        self.trial_running = False
+        self.lock = threading.Lock()
+
+    def allow(self):
+        """Return True if a call may go through now"""
+        with self.lock:
+            if self.state == OPEN:
+                if time.monotonic() - self.opened_at < self.cooldown:
+                    return False
+                self.state = HALF_OPEN
+                self.trial_running = False
+            if self.state == HALF_OPEN:
+                if self.trial_running:
+                    return False
+                self.trial_running = True
+            return True
+
+    def would_allow(self):
+        """Like allow() but without claiming the half-open trial slot"""
+        with self.lock:
+            if self.state == OPEN:
+                return time.monotonic() - self.opened_at >= self.cooldown
+            if self.state == HALF_OPEN:
+                return not self.trial_running
+            return True
+
+    def record(self, ok, recent_error_rate, recent_calls):
+        with self.lock:
+            if ok:
+                self.consecutive_failures = 0
+                if self.state == HALF_OPEN:
+                    self.state = CLOSED
+                    self.cooldown = self.base_cooldown
+                self.trial_running = False
+                return
+            self.consecutive_failures += 1
+            if self.state == HALF_OPEN:
+                # Trial failed: stay open for longer
+                self.cooldown = min(self.cooldown * 2, self.max_cooldown)
+                self._open()
+            elif self.consecutive_failures >= self.failure_threshold or (
+                    recent_calls >= self.min_calls and recent_error_rate >= self.error_rate):
+                self._open()
+
+    def release(self):
+        """Give back a half-open trial slot claimed by allow() for a call that never ran"""
+        with self.lock:
+            if self.state == HALF_OPEN:
+                self.trial_running = False
+
+    def _open(self):
+        self.state = OPEN
+        self.opened_at = time.monotonic()
+        self.trial_running = False
+
+    def retry_in(self):
+        with self.lock:
+            if self.state != OPEN:
+                return 0.0
+            return max(0.0, self.cooldown - (time.monotonic() - self.opened_at))
+
+
+class Provider:
+    """An upstream service with its own rate limiter, breaker and latency stats"""
+
+    def __init__(self, name, rate, burst, window=50, **breaker_opts):
+        self.name = name
+        self.bucket = TokenBucket(rate, burst)
+        self.breaker = CircuitBreaker(**breaker_opts)
+        self.samples = deque(maxlen=window)  # (ok, latency seconds)
+        self.calls = 0
+        self.skipped = 0
+        self.throttled = 0
+        self.lock = threading.Lock()
+
+    def available(self):
+        return self.breaker.would_allow() and self.bucket.available()
+
+    def acquire(self):
+        """Claim a call slot or raise ProviderUnavailable"""
+        if not self.breaker.would_allow():
+            self._skip()
+            raise ProviderUnavailable(
+                f"{self.name} circuit open (retry in {self.breaker.retry_in():.0f}s)")
+        # The breaker goes first so a rejected half-open call doesn't spend a token
+        if not self.breaker.allow():
+            self._skip()
+            raise ProviderUnavailable(f"{self.name} circuit half-open, trial in progress")
+        if not self.bucket.try_acquire():
+            self.breaker.release()
+            self._skip()
+            raise ProviderUnavailable(
+                f"{self.name} rate limited (retry in {self.bucket.retry_in():.0f}s)")
+
+    def _skip(self):
+        with self.lock:
+            self.skipped += 1
+
+    def record(self, ok, latency):
+        with self.lock:
+            self.calls += 1
+            self.samples.append((ok, latency))
+            error_rate, count = self._error_rate()
+        self.breaker.record(ok, error_rate, count)
+
+    def throttle(self, seconds):
+        with self.lock:
+            self.throttled += 1
+        self.bucket.throttle(seconds)
+
+    def _error_rate(self):
+        if not self.samples:
+            return 0.0, 0
+        failures = sum(1 for ok, _ in self.samples if not ok)
+        return failures / len(self.samples), len(self.samples)
+
+    def latency_percentile(self, pct):
+        """Latency percentile (seconds) over successful recent calls, or None"""
+        with self.lock:
+            latencies = sorted(lat for ok, lat in self.samples if ok)
+        if not latencies:
+            return None
+        index = min(len(latencies) - 1, int(round(pct / 100 * (len(latencies) - 1))))
+        return latencies[index]
+
+    def score(self):
+        """Lower is better: median latency inflated by the recent error rate.
+
+        None when there are no calls to judge by; inf when none succeeded.
+        """
+        with self.lock:
+            error_rate, count = self._error_rate()
+        p50 = self.latency_percentile(50)
+        if p50 is None:
+            return None if count == 0 else float("inf")
+        return p50 * (1 + 4 * error_rate)
+
+    def snapshot(self):
+        with self.lock:
+            error_rate, count = self._error_rate()
+            calls, skipped, throttled = self.calls, self.skipped, self.throttled
+        p50 = self.latency_percentile(50)
+        p90 = self.latency_percentile(90)
+        return {
+            'provider': self.name,
+            'state': self.breaker.state,
+            'tokens': round(self.bucket.level(), 1),
+            'retry_in_s': round(max(self.breaker.retry_in(), self.bucket.retry_in()), 1),
+            'p50_ms': round(p50 * 1000) if p50 is not None else None,
+            'p90_ms': round(p90 * 1000) if p90 is not None else None,
+            'error_rate': f"{error_rate:.0%}" if count else "-",
+            'calls': calls,
+            'skipped': skipped,
+            'throttled': throttled,
+        }
+
+
+PROVIDERS = {}
+_registry_lock = threading.Lock()
+
+
+def register(name, rate, burst, **opts):
+    """Register a provider (idempotent, so module reloads keep existing state)"""
+    with _registry_lock:
+        if name not in PROVIDERS:
+            PROVIDERS[name] = Provider(name, rate, burst, **opts)
+        return PROVIDERS[name]
+
+
+def get(name):
+    return PROVIDERS[name]
+
+
+def ordered(names):
+    """Available providers from `names`, best observed performance first"""
+    candidates = [PROVIDERS[n] for n in names if PROVIDERS[n].available()]
+    scores = [p.score() for p in candidates]
+    # Measured providers are reordered among their own slots; unmeasured ones
+    # keep their configured position. sorted() is stable, so ties keep it too.
+    slots = [i for i, score in enumerate(scores) if score is not None]
+    ranked = sorted(slots, key=lambda i: scores[i])
+    order = list(range(len(candidates)))
+    for slot, i in zip(slots, ranked):
+        order[slot] = i
+    # Providers whose recent calls all failed go last
+    order.sort(key=lambda i: scores[i] == float("inf"))
+    return [candidates[i].name for i in order]
+
+
+def wait_ordered(names, timeout):
+    """ordered(names), waiting up to `timeout` seconds for a rate limited one to refill.
+
+    Doesn't wait when every circuit is open: those take far longer to recover.
+    """
+    deadline = time.monotonic() + timeout
+    while True:
+        order = ordered(names)
+        remaining = deadline - time.monotonic()
+        if order or remaining <= 0:
+            return order
+        waits = [PROVIDERS[n].bucket.retry_in() for n in names if PROVIDERS[n].breaker.would_allow()]
+        if not waits:
+            return order
+        time.sleep(min(max(min(waits), 0.01), remaining))
+
+
+def throttle(name, seconds=60):
+    """Mark a provider as throttled, e.g. after an in-body rate limit error"""
+    PROVIDERS[name].throttle(seconds)
+
+
+def call(name, fn, *args, ignore=(), **kwargs):
+    """Run fn through the provider's limiter and breaker.
+
+    Exceptions listed in `ignore` are definitive answers from the provider
+    (e.g. "domain not found") and count as successful calls.
+    """
+    provider = PROVIDERS[name]
+    provider.acquire()
+    start = time.monotonic()
+    try:
+        result = fn(*args, **kwargs)
+    except ignore:
+        provider.record(True, time.monotonic() - start)
+        raise
+    except Exception:
+        provider.record(False, time.monotonic() - start)
+        raise
+    provider.record(True, time.monotonic() - start)
+    return result
+
+
+def _retry_after(response, default=60):
+    try:
+        return float(response.headers.get('Retry-After', default))
+    except (TypeError, ValueError):
+        return default
+
+
+def fetch(name, url, timeout=5, **kwargs):
+    """GET `url` through provider `name`, treating 429 and 5xx as failures"""
+    provider = PROVIDERS[name]
+    provider.acquire()
+    start = time.monotonic()
+    try:
+        response = SESSION.get(url, timeout=timeout, **kwargs)
+    except Exception:
+        provider.record(False, time.monotonic() - start)
+        raise
+    latency = time.monotonic() - start
+    if response.status_code == 429:
+        provider.record(False, latency)
+        provider.throttle(_retry_after(response))
+        raise ProviderError(f"{name} is rate limiting us (HTTP 429)")
+    if response.status_code >= 500:
+        provider.record(False, latency)
+        raise ProviderError(f"{name} returned HTTP {response.status_code}")
+    provider.record(True, latency)
+    return response
+
+
+def snapshot():
+    """Limiter and breaker state of every provider, for display"""
+    return [p.snapshot() for p in PROVIDERS.values()]
+
+
+# Known upstreams: (calls per second, burst)
+register('ipapi.co', rate=0.5, burst=10)
+register('ip-api.com', rate=0.75, burst=15)  # free tier: 45 requests/minute
+# One DNS Analyzer run is ~30 queries (records, DKIM selectors, rDNS), so the
+# bursts cover a few uncached analyses plus warm-ups before callers have to wait
+register('dns.google', rate=25, burst=100)
+register('cloudflare-dns.com', rate=25, burst=100)
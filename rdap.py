@@ -0,0 +1,300 @@
+"""RDAP domain lookups with port-43 WHOIS as a fallback.
+
+The RDAP server for each TLD comes from the IANA bootstrap registry, which
+is cached on disk and refreshed in the background once it is a day old.
+Answers are structured JSON, mapped to the same fields python-whois gives
+the WHOIS tool (registrar, status, dates, nameservers).
+"""
+import ipaddress
+import json
+import os
+import re
+import threading
+import time
+from datetime import datetime, timezone
+from urllib.parse import urlparse
+
+from whois import extract_domain
+
+import providers
+from cache import get_cache
+from whois_scheduler import get_scheduler
+
+BOOTSTRAP_URL = "https://data.iana.org/rdap/dns.json"
+BOOTSTRAP_CACHE = os.environ.get(
+    'RDAP_BOOTSTRAP_CACHE',
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), '.cache', 'rdap_dns.json'))
+REFRESH_INTERVAL = 24 * 3600
+
+REGISTRATION_CACHE_TTL = 3600
+# Seconds a lookup waits for the registry's rate limit before falling back to WHOIS
+RDAP_WAIT = 5
+
+providers.register('data.iana.org', rate=0.1, burst=2)
+
+_registration_cache = get_cache('registration', maxsize=2048, ttl=REGISTRATION_CACHE_TTL)
+
+DATE_FIELDS = ('creation_date', 'updated_date', 'expiration_date')
+
+_bootstrap = {'services': {}, 'published': None, 'loaded_at': 0.0}
+_bootstrap_lock = threading.Lock()
+_refresh_running = threading.Event()
+
+
+class RdapUnsupported(Exception):
+    """Raised when no RDAP server is known for a domain's TLD"""
+
+
+class DomainNotFound(Exception):
+    """Raised when the registry says the domain does not exist"""
+
+
+class Registration(dict):
+    """Registration record; like python-whois results, fields read as attributes"""
+
+    def __getattr__(self, name):
+        return self.get(name)
+
+
+def _parse_bootstrap(data):
+    services = {}
+    for tlds, urls in data.get('services', []):
+        https = [u for u in urls if u.startswith('https://')] or urls
+        for tld in tlds:
+            services[tld.lower()] = [u if u.endswith('/') else u + '/' for u in https]
+    return services
+
+
+def _install(data, loaded_at):
+    with _bootstrap_lock:
+        _bootstrap['services'] = _parse_bootstrap(data)
+        _bootstrap['published'] = data.get('publication')
+        _bootstrap['loaded_at'] = loaded_at
+
+
+def refresh_bootstrap():
+    """Download the IANA bootstrap file and replace the local copy atomically"""
+    response = providers.fetch('data.iana.org', BOOTSTRAP_URL, timeout=10)
+    response.raise_for_status()
+    data = response.json()
+    os.makedirs(os.path.dirname(BOOTSTRAP_CACHE), exist_ok=True)
+    tmp_path = f"{BOOTSTRAP_CACHE}.{os.getpid()}.tmp"
+    with open(tmp_path, 'w') as f:
+        json.dump(data, f)
+    os.replace(tmp_path, BOOTSTRAP_CACHE)
+    _install(data, time.time())
+
+
+def _refresh_in_background():
+    if _refresh_running.is_set():
+        return
+    _refresh_running.set()
+
+    def run():
+        try:
+            refresh_bootstrap()
+        except Exception:
+            pass  # keep serving the stale copy; retried on a later lookup
+        finally:
+            _refresh_running.clear()
+
+    threading.Thread(target=run, name="rdap-bootstrap", daemon=True).start()
+
+
+def bootstrap():
+    """TLD -> RDAP base URLs, loading or refreshing the cached registry as needed"""
+    if not _bootstrap['services'] and os.path.exists(BOOTSTRAP_CACHE):
+        try:
+            with open(BOOTSTRAP_CACHE) as f:
+                _install(json.load(f), os.path.getmtime(BOOTSTRAP_CACHE))
+        except (OSError, ValueError):
+            pass
+    if not _bootstrap['services']:
+        refresh_bootstrap()
+    elif time.time() - _bootstrap['loaded_at'] > REFRESH_INTERVAL:
+        _refresh_in_background()
+    return _bootstrap['services']
+
+
+def known_tlds():
+    """TLDs in the bootstrap registry, or an empty set if it can't be loaded.
+
+    Only TLDs with an RDAP service are listed, so most ccTLDs are missing.
+    """
+    try:
+        return set(bootstrap())
+    except Exception:
+        return set()
+
+
+def bootstrap_info():
+    """Publication date and age of the cached bootstrap registry, for display"""
+    return {
+        'published': _bootstrap['published'],
+        'age_hours': round((time.time() - _bootstrap['loaded_at']) / 3600, 1) if _bootstrap['loaded_at'] else None,
+        'tlds': len(_bootstrap['services']),
+    }
+
+
+def rdap_servers(domain):
+    """RDAP base URLs for `domain`, longest matching suffix first"""
+    services = bootstrap()
+    labels = domain.lower().rstrip('.').split('.')
+    for i in range(1, len(labels)):
+        suffix = '.'.join(labels[i:])
+        if suffix in services:
+            return services[suffix]
+    raise RdapUnsupported(f"No RDAP server published for .{labels[-1]}")
+
+
+def _provider_for(url):
+    host = urlparse(url).hostname
+    name = f"rdap:{host}"
+    if name not in providers.PROVIDERS:
+        providers.register(name, rate=2, burst=10)
+    return name
+
+
+def registry_provider(domain):
+    """Provider name that rate limits RDAP lookups for `domain`, or None if it has no RDAP server"""
+    try:
+        return _provider_for(rdap_servers(domain)[0])
+    except Exception:
+        return None
+
+
+def _vcard_name(entity):
+    for field in (entity.get('vcardArray') or [None, []])[1]:
+        if field[0] == 'fn' and field[3]:
+            return field[3]
+    return None
+
+
+def _find_entity(entities, role):
+    for entity in entities or []:
+        if role in entity.get('roles', []):
+            return entity
+        nested = _find_entity(entity.get('entities'), role)
+        if nested:
+            return nested
+    return None
+
+
+def naive_utc(value):
+    """A datetime (or python-whois list of them) as naive UTC, the form RDAP dates take"""
+    if isinstance(value, list):
+        return [naive_utc(v) for v in value]
+    if isinstance(value, datetime) and value.tzinfo:
+        return value.astimezone(timezone.utc).replace(tzinfo=None)
+    return value
+
+
+def _parse_date(value):
+    try:
+        parsed = datetime.fromisoformat(value.replace('Z', '+00:00'))
+    except (AttributeError, ValueError):
+        return None
+    return naive_utc(parsed)
+
+
+def registrable_domain(name):
+    """The domain a registry knows for a host or URL: https://www.example.co.za/x -> example.co.za"""
+    host = re.sub(r'^.*://', '', name.strip().lower()).split('/')[0].split(':')[0].rstrip('.')
+    try:
+        ipaddress.ip_address(host)
+        return host
+    except ValueError:
+        pass
+    if '.' not in host:
+        return host
+    try:
+        domain = extract_domain(host)
+    except Exception:
+        return host
+    # Suffixes missing from python-whois's list (e.g. reserved .test) come back bare
+    return domain if '.' in domain else '.'.join(host.split('.')[-2:])
+
+
+def _epp_status(status):
+    """'client transfer prohibited' -> 'clientTransferProhibited'"""
+    words = status.split()
+    return words[0] + ''.join(w.capitalize() for w in words[1:]) if words else status
+
+
+def parse_domain(data, server=None):
+    """Map an RDAP domain object to the WHOIS tool's fields"""
+    events = {e.get('eventAction'): _parse_date(e.get('eventDate')) for e in data.get('events', [])}
+    registrar = _find_entity(data.get('entities'), 'registrar')
+    registrant = _find_entity(data.get('entities'), 'registrant')
+    return Registration({
+        'domain_name': (data.get('ldhName') or '').lower() or None,
+        'registrar': _vcard_name(registrar) if registrar else None,
+        'registrant': _vcard_name(registrant) if registrant else None,
+        'status': [_epp_status(s) for s in data.get('status', [])],
+        'creation_date': events.get('registration'),
+        'updated_date': events.get('last changed'),
+        'expiration_date': events.get('expiration'),
+        'name_servers': [ns.get('ldhName', '').lower() for ns in data.get('nameservers', []) if ns.get('ldhName')],
+        'dnssec': (data.get('secureDNS') or {}).get('delegationSigned'),
+        'source': 'RDAP',
+        'server': server,
+        'raw': data,
+    })
+
+
+def rdap_lookup(domain, timeout=8):
+    """Query the registry's RDAP server for `domain`"""
+    last_error = None
+    for base in rdap_servers(domain):
+        url = f"{base}domain/{domain}"
+        provider = _provider_for(base)
+        # Bursts (bulk exports, several agents) wait briefly for the registry's budget
+        providers.wait_ordered([provider], RDAP_WAIT)
+        try:
+            response = providers.fetch(provider, url, timeout=timeout,
+                                       headers={'Accept': 'application/rdap+json'})
+        except Exception as e:
+            last_error = e
+            continue
+        if response.status_code == 404:
+            raise DomainNotFound(f"{domain} is not registered (RDAP 404 from {urlparse(base).hostname})")
+        if response.status_code != 200:
+            last_error = providers.ProviderError(f"RDAP server returned HTTP {response.status_code}")
+            continue
+        return parse_domain(response.json(), server=urlparse(base).hostname)
+    raise last_error or RdapUnsupported(f"No usable RDAP server for {domain}")
+
+
+def whois_lookup(domain):
+    """Port-43 WHOIS, normalised to the same dict shape as rdap_lookup"""
+    # Goes through the per-registry scheduler so it shares pacing with bulk runs
+    w = get_scheduler().lookup(domain)
+    record = Registration(w)
+    # python-whois dates can be timezone-aware; RDAP's are naive UTC
+    for field in DATE_FIELDS:
+        record[field] = naive_utc(record.get(field))
+    record['source'] = 'WHOIS'
+    record['server'] = None
+    record['raw'] = str(w)
+    return record
+
+
+def lookup_registration(domain, refresh=False):
+    """RDAP first; port-43 WHOIS only when RDAP is unsupported or failing.
+
+    Hosts and URLs are looked up as their registrable domain.
+    `refresh` skips the cache; the fresh record replaces the cached one.
+    """
+    domain = registrable_domain(domain)
+    record = None if refresh else _registration_cache.get(domain)
+    if record is not None:
+        # Shared caches hand back a plain dict
+        return Registration(record)
+    try:
+        record = rdap_lookup(domain)
+    except DomainNotFound:
+        raise
+    except Exception:
+        record = whois_lookup(domain)
+    _registration_cache.set(domain, record)
+    return record
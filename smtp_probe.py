@@ -0,0 +1,224 @@
+"""SMTP reachability and STARTTLS probe for a domain's mail servers.
+
+Every MX host is tried on the submission and relay ports at once: 25 and
+587 with STARTTLS, 465 with implicit TLS. Each probe records the banner,
+EHLO capabilities, TLS version and certificate, and how long the TCP
+connect, banner, EHLO and TLS steps took. Probes share a per-host deadline,
+counted from the host's first probe, so a dead MX is reported as timed out
+instead of holding up the others. Each analysis keeps at most SMTP_IN_FLIGHT
+probes running, so a domain with many MX hosts doesn't fill the shared pool.
+"""
+import os
+import smtplib
+import socket
+import ssl
+import threading
+import time
+from collections import deque
+from concurrent.futures import Future, ThreadPoolExecutor
+
+from ssl_inspect import peer_chain
+
+# port: how TLS is negotiated
+SMTP_PORTS = {25: 'starttls', 587: 'starttls', 465: 'tls'}
+SMTP_DEADLINE = 12
+# Probes one start_probes() call runs at once: two hosts on every port
+SMTP_IN_FLIGHT = 6
+EHLO_NAME = os.environ.get('SMTP_EHLO_NAME', 'support-toolkit.hostafrica.com')
+
+_pool = ThreadPoolExecutor(max_workers=24, thread_name_prefix="smtp-probe")
+
+
+class DeadlineExceeded(socket.timeout):
+    """Raised when a probe runs out of its per-host time budget"""
+
+
+class _HostDeadline:
+    """Per-host time budget that starts when the host's first probe does"""
+
+    def __init__(self, seconds):
+        self.seconds = seconds
+        self.until = None
+        self.lock = threading.Lock()
+
+    def start(self):
+        with self.lock:
+            if self.until is None:
+                self.until = time.monotonic() + self.seconds
+            return self.until
+
+
+def _ms(seconds):
+    return round(seconds * 1000, 1)
+
+
+class _TimedSMTP(smtplib.SMTP):
+    """SMTP client that times the TCP connect and can start with implicit TLS"""
+
+    def __init__(self, deadline, implicit_tls_context=None, **kwargs):
+        self.deadline = deadline
+        self.implicit_tls_context = implicit_tls_context
+        self.timings = {}
+        super().__init__(local_hostname=EHLO_NAME, **kwargs)
+
+    def remaining(self):
+        remaining = self.deadline - time.monotonic()
+        if remaining <= 0:
+            raise DeadlineExceeded("per-host deadline exceeded")
+        return remaining
+
+    def _get_socket(self, host, port, timeout):
+        start = time.monotonic()
+        sock = socket.create_connection((host, port), self.remaining(), self.source_address)
+        self.timings['tcp_ms'] = _ms(time.monotonic() - start)
+        if self.implicit_tls_context is not None:
+            start = time.monotonic()
+            sock = self.implicit_tls_context.wrap_socket(sock, server_hostname=host)
+            self.timings['tls_ms'] = _ms(time.monotonic() - start)
+        return sock
+
+    def step(self, name, fn, *args, **kwargs):
+        """Run one protocol step within the remaining budget and time it"""
+        if self.sock is not None:
+            self.sock.settimeout(self.remaining())
+        start = time.monotonic()
+        result = fn(*args, **kwargs)
+        self.timings[f"{name}_ms"] = _ms(time.monotonic() - start)
+        return result
+
+
+def _tls_details(tls_sock, verified):
+    cert = tls_sock.getpeercert() if verified else {}
+    if not cert:
+        chain = peer_chain(tls_sock, verified)
+        cert = chain[0]['info'] if chain else {}
+    details = {
+        'protocol': tls_sock.version(),
+        'cipher': (tls_sock.cipher() or (None,))[0],
+        'verified': verified,
+        'subject': dict(x[0] for x in cert.get('subject', ())).get('commonName'),
+        'issuer': dict(x[0] for x in cert.get('issuer', ())).get('organizationName'),
+        'not_after': cert.get('notAfter'),
+        'days_left': None,
+    }
+    if details['not_after']:
+        details['days_left'] = int((ssl.cert_time_to_seconds(details['not_after']) - time.time()) // 86400)
+    return details
+
+
+def _session(host, port, mode, context, deadline, result):
+    start = time.monotonic()
+    smtp = _TimedSMTP(deadline, implicit_tls_context=context if mode == 'tls' else None)
+    result['timings'] = smtp.timings
+    # starttls() needs it for SNI and hostname checks; older Pythons only set it in __init__
+    smtp._host = host
+    try:
+        # connect() covers TCP, implicit TLS and reading the 220 greeting
+        code, banner = smtp.step('connect', smtp.connect, host, port)
+        smtp.timings['banner_ms'] = round(smtp.timings.pop('connect_ms') - smtp.timings['tcp_ms']
+                                          - smtp.timings.get('tls_ms', 0), 1)
+        result['code'] = code
+        result['banner'] = banner.decode(errors='replace')
+        smtp.step('ehlo', smtp.ehlo)
+        result['esmtp'] = [f"{k.upper()} {v}".strip() for k, v in smtp.esmtp_features.items()]
+        result['starttls'] = smtp.has_extn('starttls')
+        if mode == 'starttls' and result['starttls']:
+            smtp.step('tls', smtp.starttls, context=context)
+            smtp.ehlo()
+        if mode == 'tls' or (mode == 'starttls' and result['starttls']):
+            result['tls'] = _tls_details(smtp.sock, context.verify_mode != ssl.CERT_NONE)
+        try:
+            smtp.quit()
+        except (smtplib.SMTPException, OSError):
+            pass  # everything of interest is already recorded
+    finally:
+        smtp.close()
+        result['timings']['total_ms'] = _ms(time.monotonic() - start)
+
+
+def probe_port(host, port, mode=None, deadline=None):
+    """Probe one mail server port; errors are reported in the result, not raised"""
+    mode = mode or SMTP_PORTS.get(port, 'starttls')
+    deadline = deadline or time.monotonic() + SMTP_DEADLINE
+    result = {
+        'host': host, 'port': port, 'mode': mode, 'error': None, 'error_type': None,
+        'code': None, 'banner': None, 'esmtp': [], 'starttls': None, 'tls': None,
+        'verify_error': None, 'timings': {},
+    }
+    try:
+        try:
+            _session(host, port, mode, ssl.create_default_context(), deadline, result)
+        except ssl.SSLCertVerificationError as e:
+            # Mail servers often run self-signed certs: reconnect to show it anyway
+            result['verify_error'] = e.verify_message or str(e)
+            context = ssl.create_default_context()
+            context.check_hostname = False
+            context.verify_mode = ssl.CERT_NONE
+            _session(host, port, mode, context, deadline, result)
+    except socket.gaierror as e:
+        result['error'], result['error_type'] = str(e), 'dns'
+    except socket.timeout as e:
+        result['error'], result['error_type'] = str(e) or 'timed out', 'timeout'
+    except ConnectionRefusedError as e:
+        result['error'], result['error_type'] = str(e), 'refused'
+    except smtplib.SMTPServerDisconnected as e:
+        # smtplib turns a read timeout into a disconnect
+        result['error'], result['error_type'] = str(e), 'timeout' if 'timed out' in str(e) else 'smtp'
+    except (smtplib.SMTPException, ssl.SSLError) as e:
+        result['error'], result['error_type'] = str(e), 'smtp'
+    except OSError as e:
+        result['error'], result['error_type'] = str(e), 'connection'
+    return result
+
+
+def mx_hosts(mx_answer):
+    """MX hostnames from a DoH answer, lowest preference first"""
+    records = []
+    for r in mx_answer.get('Answer') or []:
+        parts = r['data'].split()
+        if len(parts) == 2 and parts[1] != '.':
+            records.append((int(parts[0]), parts[1].rstrip('.').lower()))
+    return list(dict.fromkeys(host for _, host in sorted(records)))
+
+
+def _probe(host, port, mode, host_deadline):
+    return probe_port(host, port, mode, host_deadline.start())
+
+
+def start_probes(hosts, ports=None, deadline=SMTP_DEADLINE, in_flight=SMTP_IN_FLIGHT):
+    """Probe every host on every port, `in_flight` at a time; returns {(host, port): Future}.
+
+    `ports` maps port to 'starttls' or 'tls' (default SMTP_PORTS), so a local
+    stand-in server on an unprivileged port can be probed the same way.
+    Hosts go in order, all ports of a host together.
+    """
+    ports = ports or SMTP_PORTS
+    # All probes of a host share one deadline, counted from its first probe,
+    # so time spent queued behind other analyses doesn't count against it
+    deadlines = {host: _HostDeadline(deadline) for host in hosts}
+    jobs = deque((host, port, mode) for host in hosts for port, mode in ports.items())
+    futures = {(host, port): Future() for host, port, _ in jobs}
+    lock = threading.Lock()
+
+    def submit_next():
+        while True:
+            with lock:
+                if not jobs:
+                    return
+                host, port, mode = jobs.popleft()
+            target = futures[(host, port)]
+            if target.set_running_or_notify_cancel():
+                break  # skip probes the caller has given up on
+        probe = _pool.submit(_probe, host, port, mode, deadlines[host])
+
+        def finished(done):
+            if done.exception():
+                target.set_exception(done.exception())
+            else:
+                target.set_result(done.result())
+            submit_next()
+        probe.add_done_callback(finished)
+
+    for _ in range(min(in_flight, len(jobs))):
+        submit_next()
+    return futures
@@ -0,0 +1,257 @@
+"""TLS inspection for the SSL Check tool.
+
+One TLS connection per host is used for both the certificate inspection and
+the homepage fetch (for the mixed content check). A second, short handshake
+measures whether the server resumes TLS sessions and how much that saves.
+OCSP stapling needs a third handshake (through pyOpenSSL), so it is only
+checked on request and only for certificates that name an OCSP responder.
+"""
+import http.client
+import re
+import select
+import socket
+import ssl
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from cache import get_cache
+
+try:
+    from OpenSSL import SSL as OpenSSL_SSL  # optional, for OCSP stapling
+except ImportError:
+    OpenSSL_SSL = None
+
+MAX_BODY_BYTES = 2 * 1024 * 1024
+MAX_REDIRECTS = 5
+SSL_CACHE_TTL = 300
+
+_ssl_cache = get_cache('ssl', maxsize=1024, ttl=SSL_CACHE_TTL)
+
+
+def find_mixed_content(html):
+    """HTTP resources referenced from an HTTPS page"""
+    return re.findall(r'http://[^"\'\s<>]+', html)
+
+
+def _ms(seconds):
+    return round(seconds * 1000, 1)
+
+
+def _name(cert_field, key='commonName'):
+    return dict(x[0] for x in cert_field).get(key, 'N/A') if cert_field else 'N/A'
+
+
+def peer_chain(tls_sock, verified):
+    """Certificates presented by the server, leaf first"""
+    # Public API from Python 3.13, private _sslobj methods before that
+    getter_name = 'get_verified_chain' if verified else 'get_unverified_chain'
+    getter = getattr(tls_sock, getter_name, None) or getattr(tls_sock._sslobj, getter_name, None)
+    if getter is None:
+        return []
+    chain = []
+    for cert in getter() or []:
+        info = cert.get_info()
+        chain.append({
+            'subject': _name(info.get('subject')),
+            'issuer': _name(info.get('issuer')),
+            'organization': _name(info.get('issuer'), 'organizationName'),
+            'not_after': info.get('notAfter'),
+            'info': info,
+        })
+    return chain
+
+
+def _fetch_homepage(tls_sock, host):
+    """GET / over the already established TLS connection, following same-host redirects"""
+    conn = http.client.HTTPSConnection(host, timeout=tls_sock.gettimeout())
+    conn.sock = tls_sock
+    path = '/'
+    hops = []
+    start = time.monotonic()
+    for _ in range(MAX_REDIRECTS + 1):
+        conn.request('GET', path, headers={
+            'User-Agent': 'HostAfrica-Support-Toolkit/2.0',
+            'Accept-Encoding': 'identity',
+        })
+        response = conn.getresponse()
+        ttfb = time.monotonic() - start
+        body = response.read(MAX_BODY_BYTES)
+        location = response.getheader('Location')
+        hops.append({'path': path, 'status': response.status, 'location': location})
+        if response.status in (301, 302, 303, 307, 308) and location:
+            if location.startswith('/') and not location.startswith('//'):
+                path = location
+                if response.will_close:
+                    break
+                continue
+            redirect_host = re.sub(r'^https?://', '', location).split('/')[0].split(':')[0]
+            if location.startswith('https://') and redirect_host.lower() == host.lower():
+                path = '/' + location.split('/', 3)[3] if location.count('/') >= 3 else '/'
+                if response.will_close:
+                    break
+                continue
+        break
+    charset = response.headers.get_content_charset() or 'utf-8'
+    html = body.decode(charset, errors='replace')
+    return {
+        'status': response.status,
+        'reason': response.reason,
+        'location': location,
+        'redirects': hops[:-1],
+        'ttfb_ms': _ms(ttfb),
+        'mixed_content': find_mixed_content(html) if response.status < 300 else [],
+    }
+
+
+def _resumption(host, port, timeout, context, session):
+    """Time a second handshake offering the saved session"""
+    start = time.monotonic()
+    with socket.create_connection((host, port), timeout=timeout) as sock:
+        tcp_done = time.monotonic()
+        with context.wrap_socket(sock, server_hostname=host, session=session) as tls_sock:
+            return {
+                'resumed_tls_ms': _ms(time.monotonic() - tcp_done),
+                'session_reused': tls_sock.session_reused,
+                'resumed_total_ms': _ms(time.monotonic() - start),
+            }
+
+
+def _ocsp_stapling(host, port, timeout):
+    """Return True/False for a stapled OCSP response, None if it can't be checked"""
+    if OpenSSL_SSL is None:
+        return None
+    stapled = {}
+
+    def callback(conn, ocsp_bytes, data):
+        stapled['response'] = ocsp_bytes
+        return True
+
+    ctx = OpenSSL_SSL.Context(OpenSSL_SSL.TLS_CLIENT_METHOD)
+    ctx.set_ocsp_client_callback(callback)
+    deadline = time.monotonic() + timeout
+    with socket.create_connection((host, port), timeout=timeout) as sock:
+        conn = OpenSSL_SSL.Connection(ctx, sock)
+        conn.set_tlsext_host_name(host.encode())
+        conn.request_ocsp()
+        conn.set_connect_state()
+        while True:
+            try:
+                conn.do_handshake()
+                break
+            except (OpenSSL_SSL.WantReadError, OpenSSL_SSL.WantWriteError):
+                remaining = deadline - time.monotonic()
+                if remaining <= 0 or not select.select([sock], [], [], remaining)[0]:
+                    raise socket.timeout("OCSP stapling probe timed out")
+    return bool(stapled.get('response'))
+
+
+def inspect_host(host, port=443, timeout=10, fetch=True, ocsp=False, refresh=False):
+    """Cached inspect_uncached(); timeouts and connection errors are not cached.
+
+    `host` may carry a port ("example.com:2083") to check a non-standard one.
+    `refresh` skips the cache, e.g. right after a certificate was installed.
+    """
+    name, _, port_text = host.rpartition(':')
+    if name and ':' not in name and port_text.isdigit():
+        host, port = name, int(port_text)
+    key = (host.lower(), port, fetch, ocsp)
+    result = None if refresh else _ssl_cache.get(key)
+    if result is None:
+        result = inspect_uncached(host, port, timeout, fetch, ocsp)
+        if result['error_type'] not in ('timeout', 'connection'):
+            _ssl_cache.set(key, result)
+    return result
+
+
+def inspect_uncached(host, port=443, timeout=10, fetch=True, ocsp=False):
+    """Inspect the TLS setup of `host` and fetch its homepage over the same connection.
+
+    Returns a dict; connection problems are reported in 'error'/'error_type'
+    rather than raised, so several hosts can be checked side by side.
+    'handshakes' counts the TLS handshakes made; with `ocsp`, stapling is
+    probed over one more.
+    """
+    result = {
+        'host': host, 'port': port, 'error': None, 'error_type': None,
+        'verified': True, 'verify_error': None, 'cert': {}, 'chain': [],
+        'protocol': None, 'cipher': None, 'cipher_bits': None,
+        'ocsp': {'responders': [], 'stapled': None, 'checked': False},
+        'timings': {}, 'http': None, 'handshakes': 0,
+    }
+    context = ssl.create_default_context()
+    session = None
+    try:
+        start = time.monotonic()
+        sock = socket.create_connection((host, port), timeout=timeout)
+        tcp_done = time.monotonic()
+        result['timings']['tcp_ms'] = _ms(tcp_done - start)
+        try:
+            result['handshakes'] += 1
+            tls_sock = context.wrap_socket(sock, server_hostname=host)
+        except ssl.SSLCertVerificationError as e:
+            # Reconnect without verification so the agent can see what's wrong
+            sock.close()
+            result['verified'] = False
+            result['verify_error'] = e.verify_message or str(e)
+            context = ssl.create_default_context()
+            context.check_hostname = False
+            context.verify_mode = ssl.CERT_NONE
+            sock = socket.create_connection((host, port), timeout=timeout)
+            tcp_done = time.monotonic()
+            result['handshakes'] += 1
+            tls_sock = context.wrap_socket(sock, server_hostname=host)
+        result['timings']['tls_ms'] = _ms(time.monotonic() - tcp_done)
+
+        with tls_sock:
+            result['protocol'] = tls_sock.version()
+            cipher = tls_sock.cipher()
+            if cipher:
+                result['cipher'], _, result['cipher_bits'] = cipher
+            result['chain'] = peer_chain(tls_sock, result['verified'])
+            if result['verified']:
+                result['cert'] = tls_sock.getpeercert()
+            elif result['chain']:
+                result['cert'] = result['chain'][0]['info']
+            result['ocsp']['responders'] = list(result['cert'].get('OCSP', ()))
+
+            if fetch:
+                try:
+                    result['http'] = _fetch_homepage(tls_sock, host)
+                except Exception as e:
+                    result['http'] = {'error': str(e)}
+            # TLS 1.3 tickets arrive after the handshake, so read the session last
+            session = tls_sock.session
+    except socket.gaierror as e:
+        result['error'], result['error_type'] = str(e), 'dns'
+        return result
+    except socket.timeout as e:
+        result['error'], result['error_type'] = str(e) or 'timed out', 'timeout'
+        return result
+    except ssl.SSLError as e:
+        result['error'], result['error_type'] = str(e), 'ssl'
+        return result
+    except OSError as e:
+        result['error'], result['error_type'] = str(e), 'connection'
+        return result
+
+    if session is not None:
+        try:
+            result['handshakes'] += 1
+            result['timings'].update(_resumption(host, port, timeout, context, session))
+        except (OSError, ssl.SSLError):
+            pass
+    # Without a responder in the certificate there is nothing to staple
+    if ocsp and OpenSSL_SSL is not None and result['ocsp']['responders']:
+        result['ocsp']['checked'] = True
+        try:
+            result['handshakes'] += 1
+            result['ocsp']['stapled'] = _ocsp_stapling(host, port, timeout)
+        except Exception:
+            pass
+    return result
+
+
+def inspect_hosts(hosts, port=443, timeout=10, ocsp=False, refresh=False):
+    """Inspect several hosts (e.g. apex and www) concurrently, in input order"""
+    with ThreadPoolExecutor(max_workers=max(1, len(hosts))) as pool:
+        return list(pool.map(lambda h: inspect_host(h, port, timeout, ocsp=ocsp, refresh=refresh), hosts))
@@ -0,0 +1,173 @@
+"""Website reachability check with a per-phase timing breakdown.
+
+Each URL is fetched the way a browser would reach it: system DNS lookup,
+TCP connect, TLS handshake, request until the first byte, then the body.
+Every phase is timed separately and redirects are followed hop by hop,
+each hop on a fresh connection, so slow DNS, a slow server and redirect
+loops can be told apart. ``check_site`` runs apex and www over both HTTP
+and HTTPS concurrently.
+"""
+import http.client
+import socket
+import ssl
+import time
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urljoin, urlsplit
+
+MAX_REDIRECTS = 10
+MAX_BODY_BYTES = 5 * 1024 * 1024
+USER_AGENT = 'HostAfrica-Support-Toolkit/2.0'
+
+# Phase timings above these (ms) are called out as slow
+SLOW_DNS_MS = 500
+SLOW_CONNECT_MS = 500
+SLOW_TTFB_MS = 1500
+SLOW_TOTAL_MS = 5000
+
+_pool = ThreadPoolExecutor(max_workers=16, thread_name_prefix="web-check")
+
+
+def _ms(seconds):
+    return round(seconds * 1000, 1)
+
+
+def fetch_once(url, timeout=10):
+    """One request to `url` without following redirects; errors are reported, not raised"""
+    parts = urlsplit(url)
+    https = parts.scheme == 'https'
+    port = parts.port or (443 if https else 80)
+    path = (parts.path or '/') + (f"?{parts.query}" if parts.query else '')
+    hop = {
+        'url': url, 'ip': None, 'status': None, 'reason': None, 'location': None,
+        'bytes': 0, 'error': None, 'error_type': None,
+        'timings': {'dns_ms': None, 'tcp_ms': None, 'tls_ms': None, 'ttfb_ms': None,
+                    'transfer_ms': None, 'total_ms': None},
+    }
+    timings = hop['timings']
+    start = time.monotonic()
+    sock = None
+    try:
+        phase = 'dns'
+        infos = socket.getaddrinfo(parts.hostname, port, type=socket.SOCK_STREAM)
+        timings['dns_ms'] = _ms(time.monotonic() - start)
+
+        phase = 'connect'
+        mark = time.monotonic()
+        family, _, _, _, address = infos[0]
+        hop['ip'] = address[0]
+        sock = socket.socket(family, socket.SOCK_STREAM)
+        sock.settimeout(timeout)
+        sock.connect(address)
+        timings['tcp_ms'] = _ms(time.monotonic() - mark)
+
+        if https:
+            phase = 'tls'
+            mark = time.monotonic()
+            sock = ssl.create_default_context().wrap_socket(sock, server_hostname=parts.hostname)
+            timings['tls_ms'] = _ms(time.monotonic() - mark)
+
+        phase = 'http'
+        conn = (http.client.HTTPSConnection if https else http.client.HTTPConnection)(
+            parts.hostname, port, timeout=timeout)
+        conn.sock = sock
+        mark = time.monotonic()
+        conn.request('GET', path, headers={'User-Agent': USER_AGENT, 'Accept-Encoding': 'identity'})
+        response = conn.getresponse()
+        timings['ttfb_ms'] = _ms(time.monotonic() - mark)
+        mark = time.monotonic()
+        hop['bytes'] = len(response.read(MAX_BODY_BYTES))
+        timings['transfer_ms'] = _ms(time.monotonic() - mark)
+        hop['status'], hop['reason'] = response.status, response.reason
+        hop['location'] = response.getheader('Location')
+    except socket.gaierror as e:
+        timings['dns_ms'] = _ms(time.monotonic() - start)
+        hop['error'], hop['error_type'] = str(e), 'dns'
+    except socket.timeout:
+        hop['error'], hop['error_type'] = f"{phase} timed out", 'timeout'
+    except ssl.SSLCertVerificationError as e:
+        hop['error'], hop['error_type'] = e.verify_message or str(e), 'certificate'
+    except ssl.SSLError as e:
+        hop['error'], hop['error_type'] = str(e), 'tls'
+    except (http.client.HTTPException, OSError) as e:
+        hop['error'], hop['error_type'] = str(e) or type(e).__name__, 'refused' if phase == 'connect' else phase
+    finally:
+        if sock is not None:
+            sock.close()
+        timings['total_ms'] = _ms(time.monotonic() - start)
+    return hop
+
+
+def check_url(url, timeout=10, max_redirects=MAX_REDIRECTS):
+    """Fetch `url` and follow its redirects, timing every hop.
+
+    'outcome' is ok, error, redirect_loop or too_many_redirects; 'final'
+    is the last hop and 'total_ms' the time across all hops.
+    """
+    hops = []
+    seen = set()
+    outcome = 'ok'
+    while True:
+        hop = fetch_once(url, timeout)
+        hops.append(hop)
+        seen.add(url)
+        if hop['error']:
+            outcome = 'error'
+            break
+        if hop['status'] not in (301, 302, 303, 307, 308) or not hop['location']:
+            break
+        url = urljoin(url, hop['location'])
+        if url in seen:
+            outcome = 'redirect_loop'
+            hop['redirects_to'] = url
+            break
+        if len(hops) > max_redirects:
+            outcome = 'too_many_redirects'
+            break
+    return {
+        'start_url': hops[0]['url'],
+        'outcome': outcome,
+        'hops': hops,
+        'final': hops[-1],
+        'total_ms': round(sum(h['timings']['total_ms'] for h in hops), 1),
+    }
+
+
+def check_site(domain, timeout=10):
+    """Check apex and www over HTTP and HTTPS concurrently; returns {url: Future}"""
+    apex = domain[4:] if domain.startswith('www.') else domain
+    urls = [f"{scheme}://{host}/" for host in (apex, f"www.{apex}") for scheme in ('https', 'http')]
+    return {url: _pool.submit(check_url, url, timeout) for url in urls}
+
+
+def findings(results):
+    """(level, text) verdicts for {url: check_url result}; level is ok/warn/error"""
+    found = []
+    for url, res in results.items():
+        final = res['final']
+        if res['outcome'] == 'redirect_loop':
+            found.append(('error', f"{url} redirect loop ({len(res['hops'])} hops, back to {final['redirects_to']})"))
+            continue
+        if res['outcome'] == 'too_many_redirects':
+            found.append(('error', f"{url} redirects more than {MAX_REDIRECTS} times"))
+            continue
+        if res['outcome'] == 'error':
+            found.append(('error', f"{final['url']} failed at {final['error_type']}: {final['error']}"))
+            continue
+        if final['status'] >= 500:
+            found.append(('error', f"{url} ends in HTTP {final['status']} {final['reason']} (server error)"))
+        elif final['status'] >= 400:
+            found.append(('warn', f"{url} ends in HTTP {final['status']} {final['reason']}"))
+        if url.startswith('http://') and not final['url'].startswith('https://'):
+            found.append(('warn', f"{url} is not redirected to HTTPS"))
+        for hop in res['hops']:
+            t = hop['timings']
+            if t['dns_ms'] and t['dns_ms'] > SLOW_DNS_MS:
+                found.append(('warn', f"Slow DNS for {urlsplit(hop['url']).hostname}: {t['dns_ms']:.0f} ms"))
+            if t['tcp_ms'] and t['tcp_ms'] > SLOW_CONNECT_MS:
+                found.append(('warn', f"Slow connect to {hop['ip']}: {t['tcp_ms']:.0f} ms (network distance or packet loss)"))
+            if t['ttfb_ms'] and t['ttfb_ms'] > SLOW_TTFB_MS:
+                found.append(('warn', f"Slow server response from {hop['url']}: {t['ttfb_ms']:.0f} ms to first byte"))
+        if res['total_ms'] > SLOW_TOTAL_MS:
+            found.append(('warn', f"{url} took {res['total_ms'] / 1000:.1f}s in total"))
+    # The same slow DNS or server shows up on several URLs; report it once
+    return list(dict.fromkeys(found)) or [('ok', "All variants respond without errors or slow phases")]
@@ -0,0 +1,230 @@
+"""Per-registry scheduling of port-43 WHOIS queries.
+
+Every `.com` lookup goes to the same Verisign server, every `.co.za` one to
+the same ZACR server, and registries throttle or ban clients that burst.
+Lookups are therefore queued per WHOIS server: each server gets its own
+concurrency limit and minimum spacing between queries, while different
+servers are queried in parallel. Spacing widens when a server signals a
+quota problem and slowly narrows back while it answers cleanly.
+"""
+import socket
+import threading
+import time
+from collections import deque
+from concurrent.futures import Future, ThreadPoolExecutor, as_completed
+
+from whois import NICClient
+from whois.exceptions import WhoisDomainNotFoundError
+from whois.parser import WhoisEntry
+
+import providers
+
+# server: (max concurrent queries, minimum seconds between queries)
+SERVER_LIMITS = {
+    'whois.verisign-grs.com': (2, 0.5),
+    'whois.publicinterestregistry.org': (1, 1.0),
+    'whois.identitydigital.services': (1, 1.0),
+    'whois.registry.net.za': (1, 2.0),
+    'whois.nic.uk': (1, 2.0),
+    'whois.denic.de': (1, 2.0),
+}
+DEFAULT_LIMIT = (1, 1.0)
+MAX_INTERVAL = 60.0
+MAX_RETRIES = 2
+# Longest a single interactive lookup waits for a server's breaker to close
+LOOKUP_WAIT = 30.0
+# Longest a TLD referral waits for the IANA rate limit (bulk runs over many TLDs)
+REFERRAL_WAIT = 10.0
+
+# Answers registries give instead of data when we query too fast
+QUOTA_MARKERS = (
+    'quota exceeded', 'limit exceeded', 'too many', 'try again later',
+    'rate limit', 'exceeded the maximum', 'access denied', 'temporarily blocked',
+)
+
+providers.register('whois.iana.org', rate=2, burst=5)
+
+
+class WhoisThrottled(Exception):
+    """Raised when a WHOIS server answers with a quota or rate limit message"""
+
+
+_tld_servers = {}
+_tld_lock = threading.Lock()
+
+
+def whois_server(domain):
+    """Registry WHOIS server for `domain` (IANA referrals are cached per TLD)"""
+    tld = domain.rstrip('.').rsplit('.', 1)[-1].lower()
+    with _tld_lock:
+        server = _tld_servers.get(tld)
+    if server is None:
+        providers.wait_ordered(['whois.iana.org'], REFERRAL_WAIT)
+        server = providers.call('whois.iana.org', NICClient().choose_server, domain)
+        if not server:
+            raise WhoisDomainNotFoundError(f"No WHOIS server known for .{tld}")
+        with _tld_lock:
+            _tld_servers[tld] = server
+    return server
+
+
+def query_server(domain, server, recurse=False, timeout=10):
+    """Run one WHOIS query against `server` and parse it like python-whois does"""
+    flags = NICClient.WHOIS_RECURSE if recurse else 0
+    text = NICClient().whois(domain, server, flags, quiet=True, timeout=timeout,
+                             ignore_socket_errors=False)
+    if not text.strip():
+        raise WhoisThrottled(f"{server} returned an empty answer")
+    lowered = text[:2000].lower()
+    if any(marker in lowered for marker in QUOTA_MARKERS) and 'domain name:' not in lowered:
+        raise WhoisThrottled(f"{server}: {text.strip().splitlines()[0][:120]}")
+    return WhoisEntry.load(domain, text)
+
+
+class _Server:
+    """Queue and pacing state for one WHOIS server"""
+
+    def __init__(self, name, limits):
+        self.name = name
+        self.max_active, self.base_interval = limits.get(name, DEFAULT_LIMIT)
+        self.interval = self.base_interval
+        self.next_allowed = 0.0
+        self.active = 0
+        self.queue = deque()  # (domain, recurse, future, attempt, give_up_at)
+        # Breaker and latency stats per server; pacing itself is done here
+        self.provider = f"whois:{name}"
+        providers.register(self.provider, rate=max(1.0, 2 / self.base_interval), burst=5)
+
+    def stats(self):
+        return {
+            'server': self.name,
+            'queued': len(self.queue),
+            'active': self.active,
+            'interval_s': round(self.interval, 2),
+        }
+
+
+class WhoisScheduler:
+    """Queues WHOIS lookups per registry server and dispatches them politely"""
+
+    def __init__(self, max_workers=16, limits=None, timeout=10):
+        self.limits = dict(SERVER_LIMITS, **(limits or {}))
+        self.timeout = timeout
+        self.servers = {}
+        self.pool = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="whois")
+        self.cond = threading.Condition()
+        self.dispatcher = threading.Thread(target=self._dispatch, name="whois-dispatch", daemon=True)
+        self.dispatcher.start()
+
+    def submit(self, domain, recurse=False, max_wait=None):
+        """Queue a lookup; the returned Future resolves to a WhoisEntry.
+
+        While the server's breaker is open or its budget empty the lookup waits
+        in the queue; with `max_wait`, it fails once it would wait longer.
+        """
+        give_up_at = time.monotonic() + max_wait if max_wait is not None else None
+        future = Future()
+        try:
+            server = whois_server(domain)
+        except Exception as e:
+            future.set_exception(e)
+            return future
+        with self.cond:
+            if server not in self.servers:
+                self.servers[server] = _Server(server, self.limits)
+            self.servers[server].queue.append((domain, recurse, future, 0, give_up_at))
+            self.cond.notify()
+        return future
+
+    def lookup(self, domain, recurse=True):
+        """Blocking single lookup that still respects the per-server pacing"""
+        return self.submit(domain, recurse=recurse, max_wait=LOOKUP_WAIT).result()
+
+    def map(self, domains, recurse=False):
+        """Queue many lookups; yields (domain, entry, error) as they complete"""
+        futures = {self.submit(d, recurse=recurse): d for d in dict.fromkeys(domains)}
+        for future in as_completed(futures):
+            error = future.exception()
+            yield futures[future], (None if error else future.result()), error
+
+    def stats(self):
+        with self.cond:
+            return [s.stats() for s in self.servers.values()]
+
+    def _dispatch(self):
+        while True:
+            with self.cond:
+                now = time.monotonic()
+                wake = None
+                for server in self.servers.values():
+                    while server.queue and server.active < server.max_active and now >= server.next_allowed:
+                        job = server.queue.popleft()
+                        server.active += 1
+                        server.next_allowed = now + server.interval
+                        self.pool.submit(self._run, server, *job)
+                    if server.queue and server.active < server.max_active:
+                        delay = server.next_allowed - now
+                        wake = delay if wake is None else min(wake, delay)
+                self.cond.wait(timeout=wake)
+
+    def _run(self, server, domain, recurse, future, attempt, give_up_at):
+        if attempt == 0 and not future.running() and not future.set_running_or_notify_cancel():
+            self._finish(server, ok=True)
+            return
+        try:
+            entry = providers.call(server.provider, query_server, domain, server.name,
+                                   recurse=recurse, timeout=self.timeout,
+                                   ignore=(WhoisDomainNotFoundError,))
+        except providers.ProviderUnavailable as e:
+            # Breaker open or budget empty: hold the whole server back until it
+            # may be called again, and keep the job at the front of its queue
+            provider = providers.get(server.provider)
+            delay = max(provider.breaker.retry_in(), provider.bucket.retry_in(), server.interval)
+            with self.cond:
+                server.active -= 1
+                if give_up_at is not None and time.monotonic() + delay > give_up_at:
+                    future.set_exception(e)
+                else:
+                    server.next_allowed = max(server.next_allowed, time.monotonic() + delay)
+                    server.queue.appendleft((domain, recurse, future, attempt, give_up_at))
+                self.cond.notify()
+            return
+        except (WhoisThrottled, socket.timeout, ConnectionResetError) as e:
+            self._finish(server, ok=False)
+            if attempt < MAX_RETRIES:
+                # Server pushed back: it has been slowed down, retry at the back of its queue
+                with self.cond:
+                    server.queue.append((domain, recurse, future, attempt + 1, give_up_at))
+                    self.cond.notify()
+            else:
+                future.set_exception(e)
+            return
+        except Exception as e:
+            self._finish(server, ok=True)
+            future.set_exception(e)
+            return
+        self._finish(server, ok=True)
+        future.set_result(entry)
+
+    def _finish(self, server, ok):
+        with self.cond:
+            server.active -= 1
+            if ok:
+                server.interval = max(server.base_interval, server.interval * 0.9)
+            else:
+                server.interval = min(MAX_INTERVAL, server.interval * 2)
+                server.next_allowed = time.monotonic() + server.interval
+            self.cond.notify()
+
+
+_scheduler = None
+_scheduler_lock = threading.Lock()
+
+
+def get_scheduler():
+    """Process-wide scheduler, shared by every session and bulk run"""
+    global _scheduler
+    with _scheduler_lock:
+        if _scheduler is None:
+            _scheduler = WhoisScheduler()
+        return _scheduler